@@ -0,0 +1,109 @@
+"""
+Executor throughput benchmark on the simulated serial backend.
+
+Runs Gantry.run_gcode against SimulatedAxisSerial/SimulatedToolSerial so the
+pacing of set_xy can be measured without the machine: wall time, moves per
+second, setpoint latency (command to motor settled) and stall time (time the
+executor kept waiting after both motors had settled).
+
+Usage:
+    python benchmarks/bench_executor.py [gcode file] [--velocity-limit 50] [--max-moves 50] [--pipelined [--lookahead 8]] [-o result.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from spin_servos import Axis, Gantry, Tool  # noqa: E402
+
+
+def truncated_copy(gcode_file, max_moves, directory):
+    """
+    Copies the first `max_moves` G1 lines (plus tool commands) of a file,
+    switching the tool off at the cut so the copy still validates.
+    """
+    path = os.path.join(directory, "bench.gcode")
+    with open(gcode_file) as src, open(path, "w") as dst:
+        moves = 0
+        for line in src:
+            if line.startswith("G1"):
+                moves += 1
+                if moves > max_moves:
+                    dst.write("M5\n")
+                    break
+            dst.write(line)
+    return path, min(moves, max_moves)
+
+
+def stall_time(axes):
+    """
+    Sum over setpoints of the time between the last axis settling and the next
+    setpoint being sent, i.e. time the executor spent waiting on a stopped machine.
+    """
+    sent = sorted({round(sp[0], 4) for ax in axes for sp in ax.ser.setpoints})
+    reached = {}
+    for ax in axes:
+        for t_sent, _, t_reached in ax.ser.setpoints:
+            key = round(t_sent, 4)
+            if t_reached is not None:
+                reached[key] = max(reached.get(key, t_reached), t_reached)
+    total = 0.0
+    for t_sent, t_next in itertools.pairwise(sent):
+        if t_sent in reached:
+            total += max(0.0, t_next - reached[t_sent])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("gcode", nargs="?", default=os.path.join(ROOT, "example.gcode"), help="G-code file to run")
+    parser.add_argument("--velocity-limit", type=float, default=50, help="Axis velocity limit in rad/s")
+    parser.add_argument("--max-moves", type=int, default=50, help="Only run the first N moves")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Wait on telemetry for every point (Gantry accuracy mode)")
+    parser.add_argument("--lookahead", type=int, default=8, help="Points queued to merge collinear runs when pipelined")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    x_axis = Axis(sn="SIM-X", simulated=True)
+    y_axis = Axis(sn="SIM-Y", simulated=True)
+    tool = Tool(sn="SIM-TOOL", simulated=True)
+    for axis in (x_axis, y_axis):
+        axis.set_velocity_limit(args.velocity_limit)
+    gantry = Gantry(x_axis, y_axis, tool=tool, pipelined=args.pipelined, lookahead=args.lookahead)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        gcode_file, moves = truncated_copy(args.gcode, args.max_moves, workdir)
+        start = time.perf_counter()
+        gantry.run_gcode(gcode_file)
+        elapsed = time.perf_counter() - start
+
+    axes = {"x": x_axis.ser.stats(), "y": y_axis.ser.stats()}
+    if args.pipelined:
+        axes["x"]["pipeline"] = x_axis.pipeline.metrics()
+        axes["y"]["pipeline"] = y_axis.pipeline.metrics()
+    results = {
+        "gcode": args.gcode,
+        "moves": moves,
+        "velocity_limit": args.velocity_limit,
+        "pipelined": args.pipelined,
+        "wall_time_s": elapsed,
+        "moves_per_s": moves/elapsed if elapsed else None,
+        "stall_time_s": stall_time([x_axis, y_axis]),
+        "tool_switches": len(tool.ser.switches),
+        "axes": axes,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
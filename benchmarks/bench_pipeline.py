@@ -0,0 +1,179 @@
+"""
+Stage-by-stage benchmark of the gerber2gcode pipeline on synthetic boards.
+
+Times parse, recur_is_bounded filtering, Region2 -> Polygon, buffer,
+contour_parallel, GCode.add_toolpath and save for each board size, records the
+peak traced memory and the process peak RSS of every stage and writes
+everything to a JSON file so two runs can be compared. tracemalloc only sees
+Python allocations, not the GEOS memory behind shapely geometries, hence the
+RSS; each board runs in a fresh interpreter so its RSS peak is its own.
+
+Usage:
+    python benchmarks/bench_pipeline.py --pads 100 1000 --pours 2 --arcs 0.25 -o bench.json
+    python benchmarks/bench_pipeline.py --pads 100 1000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gerber2gcode  # noqa: E402
+from gcode import GCode  # noqa: E402
+from synthetic import write_board  # noqa: E402
+
+
+def max_rss_bytes():
+    """
+    Peak resident set size of this process so far (ru_maxrss is in kB on Linux, bytes on macOS).
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_stage(results, name, func, *args):
+    """
+    Runs one stage, storing its wall time, peak traced memory, the process
+    peak RSS after it and how much the stage raised that peak in `results`.
+    """
+    tracemalloc.reset_peak()
+    rss_before = max_rss_bytes()
+    start = time.perf_counter()
+    value = func(*args)
+    elapsed = time.perf_counter() - start
+    rss_after = max_rss_bytes()
+    results[name] = {
+        "seconds": elapsed,
+        "peak_bytes": tracemalloc.get_traced_memory()[1],
+        "max_rss_bytes": rss_after,
+        "rss_growth_bytes": rss_after - rss_before,
+    }
+    return value
+
+
+def add_toolpath(toolpath, output_file):
+    gcode = GCode(output_file)
+    gcode.add_toolpath(toolpath)
+    return gcode
+
+
+def bench_board(n_pads, n_pours, arc_fraction, toolhead, workdir):
+    """
+    Benchmarks every pipeline stage on one synthetic board.
+
+    Returns:
+        dict: board parameters, per-stage timings and feature counts.
+    """
+    outline_file, mask_file = write_board(os.path.join(workdir, f"board_{n_pads}"), n_pads,
+                                          n_pours=n_pours, arc_fraction=arc_fraction)
+    output_file = os.path.join(workdir, f"board_{n_pads}.gcode")
+    stages = {}
+
+    tracemalloc.start()
+    outline_info, parsed = run_stage(stages, "parse", gerber2gcode.parse_gerbers, outline_file, mask_file)
+    regions = run_stage(stages, "recur_is_bounded", gerber2gcode.bounded_regions, parsed, outline_info)
+    polygons = run_stage(stages, "region_to_polygon", gerber2gcode.regions_to_polygons, regions)
+    buffered = run_stage(stages, "buffer", gerber2gcode.buffer_polygons, polygons, toolhead)
+    toolpath = run_stage(stages, "contour_parallel", gerber2gcode.generate_toolpaths, buffered, toolhead)
+    gcode = run_stage(stages, "add_toolpath", add_toolpath, toolpath, output_file)
+    run_stage(stages, "save", gcode.save)
+    overall_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "pads": n_pads,
+        "pours": n_pours,
+        "arc_fraction": arc_fraction,
+        "toolhead": toolhead,
+        "polygons": len(polygons),
+        "toolpath_points": toolpath.n_points,
+        "gcode_lines": gcode.line_count,
+        "total_seconds": sum(stage["seconds"] for stage in stages.values()),
+        "peak_bytes": overall_peak,
+        "max_rss_bytes": max_rss_bytes(),
+        "stages": stages,
+    }
+
+
+def bench_board_subprocess(n_pads, n_pours, arc_fraction, toolhead, workdir):
+    """
+    Runs bench_board in a fresh interpreter, so the peak RSS is not carried
+    over from earlier boards, and returns its results.
+    """
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--board", str(n_pads),
+                             "--pours", str(n_pours), "--arcs", str(arc_fraction), "--toolhead", str(toolhead),
+                             "--workdir", workdir], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"board with {n_pads} pads failed: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(current, baseline):
+    """
+    Prints the per-stage time ratio of `current` against a `baseline` run.
+    """
+    base = {(b["pads"], b["pours"], b["arc_fraction"]): b for b in baseline["boards"]}
+    for board in current["boards"]:
+        ref = base.get((board["pads"], board["pours"], board["arc_fraction"]))
+        if ref is None:
+            continue
+        print(f"pads={board['pads']} pours={board['pours']} arcs={board['arc_fraction']}")
+        for name, stage in board["stages"].items():
+            if name in ref["stages"] and ref["stages"][name]["seconds"] > 0:
+                ratio = stage["seconds"] / ref["stages"][name]["seconds"]
+                print(f"  {name:<18} {stage['seconds']:9.4f}s  x{ratio:5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pads", type=int, nargs="+", default=[100, 1000], help="Pad counts to benchmark")
+    parser.add_argument("--pours", type=int, default=0, help="Copper pours per board")
+    parser.add_argument("--arcs", type=float, default=0.0, help="Fraction of pads with an arc edge")
+    parser.add_argument("--toolhead", type=float, default=gerber2gcode.TOOLHEAD, help="Spray width in mm")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    # Used by bench_board_subprocess: benchmark one board here and print its results as JSON
+    parser.add_argument("--board", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.board is not None:
+        print(json.dumps(bench_board(args.board, args.pours, args.arcs, args.toolhead, args.workdir)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        boards = []
+        for n_pads in args.pads:
+            board = bench_board_subprocess(n_pads, args.pours, args.arcs, args.toolhead, workdir)
+            boards.append(board)
+            print(f"pads={n_pads:<7} polygons={board['polygons']:<7} total={board['total_seconds']:.3f}s "
+                  f"peak={board['peak_bytes']/1e6:.1f}MB rss={board['max_rss_bytes']/1e6:.1f}MB")
+            for name, stage in board["stages"].items():
+                print(f"  {name:<18} {stage['seconds']:9.4f}s {stage['peak_bytes']/1e6:8.1f}MB "
+                      f"rss +{stage['rss_growth_bytes']/1e6:6.1f}MB")
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "boards": boards,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Import-time benchmark for the conversion modules.
+
+Each module is imported in a fresh interpreter so earlier imports cannot hide
+the cost. The run fails if a core module cannot be imported, drags in
+plotting or clustering libraries, or takes longer than the time budget.
+
+Usage:
+    python benchmarks/import_time.py [--budget 0.5] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules on the headless parse -> polygons -> toolpaths -> G-code path
+CORE_MODULES = ["helpers", "gcode", "gerber2gcode"]
+# Libraries that must only be loaded on demand
+HEAVY_MODULES = ["matplotlib", "sklearn", "scipy"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def time_import(module, repeat=5):
+    """
+    Imports a module in `repeat` fresh interpreters.
+
+    Returns:
+        dict: best import time in seconds and the heavy modules it pulled in,
+        or the error if the module could not be imported.
+    """
+    best = None
+    heavy = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                cwd=ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        best = sample["seconds"] if best is None else min(best, sample["seconds"])
+        heavy = sample["heavy"]
+    return {"module": module, "seconds": best, "heavy": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum import time per module in seconds")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = [time_import(module, args.repeat) for module in CORE_MODULES]
+    failed = False
+    for res in results:
+        if "error" in res:
+            # A module that cannot be imported was not measured, so the check cannot pass
+            print(f"{res['module']:<14} FAIL import error ({res['error']})")
+            failed = True
+            continue
+        status = "ok"
+        if res["heavy"]:
+            status = f"FAIL loads {', '.join(res['heavy'])}"
+            failed = True
+        elif res["seconds"] > args.budget:
+            status = f"FAIL over {args.budget}s budget"
+            failed = True
+        print(f"{res['module']:<14} {res['seconds']*1000:8.1f} ms  {status}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Synthetic Gerber generators for the benchmarks.
+
+Boards are laid out as a square grid of rectangular pads, optionally with
+copper pours and pads with a rounded (counterclockwise arc) end, so the
+number of features can be scaled without real artwork.
+"""
+import math
+import os
+
+import numpy as np
+
+HEADER = """%FSLAX46Y46*%
+%MOMM*%
+%TF.FileFunction,{function}*%
+"""
+UNITS = 1e6  # 4.6 coordinate format
+
+
+def _coord(value):
+    return int(round(value * UNITS))
+
+
+def _xy(x, y):
+    return f"X{_coord(x)}Y{_coord(y)}"
+
+
+def pad_grid(n_pads, pitch=2.54, origin=(5.0, 5.0)):
+    """
+    Lower-left corners of `n_pads` pads laid out on a square grid.
+
+    Returns:
+        ndarray: (n_pads, 2) array of x, y corners in mm.
+    """
+    cols = max(1, math.ceil(math.sqrt(n_pads)))
+    idx = np.arange(n_pads)
+    return np.column_stack([origin[0] + (idx % cols) * pitch, origin[1] + (idx // cols) * pitch])
+
+
+def board_size(n_pads, pitch=2.54, margin=5.0, n_pours=0, pour_size=20.0):
+    """
+    Width and height of a board that holds the pad grid and the pours.
+    """
+    cols = max(1, math.ceil(math.sqrt(n_pads)))
+    rows = max(1, math.ceil(n_pads / cols))
+    width = 2 * margin + cols * pitch + n_pours * (pour_size + margin)
+    height = 2 * margin + max(rows * pitch, pour_size if n_pours else 0)
+    return width, height
+
+
+def outline_gerber(width, height):
+    """
+    Gerber profile (outline) layer for a width x height board.
+    """
+    lines = [HEADER.format(function="Profile,NP"), "%ADD10C,0.100000*%\n", "D10*\n", "G01*\n"]
+    corners = [(0, 0), (width, 0), (width, height), (0, height), (0, 0)]
+    lines.append(f"{_xy(*corners[0])}D02*\n")
+    lines.extend(f"{_xy(x, y)}D01*\n" for x, y in corners[1:])
+    lines.append("M02*\n")
+    return "".join(lines)
+
+
+def _region(points, arc=None):
+    """
+    G36/G37 region through `points`. If `arc` is given as (end, centre) it
+    closes the region with a counterclockwise arc before the final line.
+    """
+    lines = ["G36*\n", f"{_xy(*points[0])}D02*\n"]
+    for x, y in points[1:]:
+        lines.append(f"{_xy(x, y)}D01*\n")
+    if arc is not None:
+        (ex, ey), (cx, cy) = arc
+        sx, sy = points[-1]
+        lines.append(f"G03{_xy(ex, ey)}I{_coord(cx - sx)}J{_coord(cy - sy)}D01*\n")
+        lines.append("G01*\n")
+    lines.append(f"{_xy(*points[0])}D01*\n")
+    lines.append("G37*\n")
+    return "".join(lines)
+
+
+def mask_gerber(n_pads, pitch=2.54, size=1.5, n_pours=0, pour_size=20.0, arc_fraction=0.0, margin=5.0):
+    """
+    Gerber soldermask layer with a grid of pad regions and optional pours.
+
+    Parameters:
+        n_pads (int): Number of pads.
+        pitch (float): Pad grid pitch in mm.
+        size (float): Pad edge length in mm.
+        n_pours (int): Number of square copper pours placed right of the pads.
+        pour_size (float): Pour edge length in mm.
+        arc_fraction (float): Fraction of pads closed with a round end (arc).
+
+    Returns:
+        str: Gerber file contents.
+    """
+    parts = [HEADER.format(function="Soldermask,Top"), "%LPD*%\n", "G01*\n", "G75*\n"]
+    n_arcs = int(round(n_pads * arc_fraction))
+    for i, (x, y) in enumerate(pad_grid(n_pads, pitch, (margin, margin))):
+        if i < n_arcs:
+            r = size / 2
+            parts.append(_region([(x, y), (x + size, y), (x + size, y + size)],
+                                 arc=((x, y + size), (x + r, y + size))))
+        else:
+            parts.append(_region([(x, y), (x + size, y), (x + size, y + size), (x, y + size)]))
+
+    grid_width, _ = board_size(n_pads, pitch, margin)
+    for i in range(n_pours):
+        x = grid_width + i * (pour_size + margin)
+        y = margin
+        parts.append(_region([(x, y), (x + pour_size, y), (x + pour_size, y + pour_size), (x, y + pour_size)]))
+    parts.append("M02*\n")
+    return "".join(parts)
+
+
+def write_board(directory, n_pads, n_pours=0, arc_fraction=0.0, pitch=2.54, size=1.5, pour_size=20.0):
+    """
+    Writes a synthetic outline/mask pair to `directory`.
+
+    Returns:
+        tuple: (outline path, mask path)
+    """
+    os.makedirs(directory, exist_ok=True)
+    width, height = board_size(n_pads, pitch, n_pours=n_pours, pour_size=pour_size)
+    outline_path = os.path.join(directory, "synthetic.GM1")
+    mask_path = os.path.join(directory, "synthetic.GM10")
+    with open(outline_path, "w") as f:
+        f.write(outline_gerber(width, height))
+    with open(mask_path, "w") as f:
+        f.write(mask_gerber(n_pads, pitch, size, n_pours, pour_size, arc_fraction))
+    return outline_path, mask_path
+
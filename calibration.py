@@ -0,0 +1,154 @@
+import json
+import os
+import time
+
+import numpy as np
+
+CALIBRATION_DIR = "./calibration"
+
+
+class AxisCalibration():
+    def __init__(self, scale=1.0, offset=0.0, backlash=0.0, sn=None):
+        """
+        Mapping from a requested position to the position to command so the
+        axis ends up where it was asked to:
+
+            commanded = (requested - offset - direction*backlash/2) / scale
+
+        where direction is +1/-1 for the direction of the move, i.e. the
+        inverse of the fitted model measured = scale*commanded + offset + direction*backlash/2.
+
+        Parameters:
+            scale (float): Measured mm per commanded mm (pulley radius error).
+            offset (float): Measured position at commanded 0, in mm.
+            backlash (float): Measured position difference between approaching
+                a point from below and from above, in mm.
+            sn (str): Serial number of the motor the profile belongs to.
+        """
+        self.scale = scale
+        self.offset = offset
+        self.backlash = backlash
+        self.sn = sn
+
+    def command_mm(self, requested_mm, direction):
+        return (requested_mm - self.offset - direction*self.backlash/2)/self.scale
+
+    def to_dict(self):
+        return {"sn": self.sn, "scale": self.scale, "offset": self.offset, "backlash": self.backlash}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["scale"], data["offset"], data["backlash"], data.get("sn"))
+
+    def save(self, directory=CALIBRATION_DIR):
+        """
+        Stores the profile as <directory>/<sn>.json.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.sn}.json"), "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, sn, directory=CALIBRATION_DIR):
+        """
+        Loads the profile of motor `sn`, or an identity mapping if there is none.
+        """
+        path = os.path.join(directory, f"{sn}.json")
+        if not os.path.exists(path):
+            return cls(sn=sn)
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_calibration(commanded_mm, measured_mm, direction, sn=None):
+    """
+    Least-squares fit of measured = scale*commanded + offset + direction*backlash/2.
+
+    Parameters:
+        commanded_mm (array-like): Commanded positions.
+        measured_mm (array-like): Settled positions for each command.
+        direction (array-like): +1 or -1, the direction each point was approached from.
+
+    Returns:
+        tuple: (AxisCalibration, residual RMS in mm)
+    """
+    commanded_mm = np.asarray(commanded_mm, dtype=float)
+    measured_mm = np.asarray(measured_mm, dtype=float)
+    direction = np.asarray(direction, dtype=float)
+    columns = [commanded_mm, np.ones_like(commanded_mm)]
+    if np.any(direction > 0) and np.any(direction < 0):
+        columns.append(direction/2)
+    A = np.column_stack(columns)
+    coef, *_ = np.linalg.lstsq(A, measured_mm, rcond=None)
+    residual = measured_mm - A @ coef
+    backlash = coef[2] if len(coef) > 2 else 0.0
+    return AxisCalibration(float(coef[0]), float(coef[1]), float(backlash), sn), float(np.sqrt(np.mean(residual**2)))
+
+
+def sweep(axis, positions_mm, settle_velocity=0.02, settle_time=0.2, timeout=10):
+    """
+    Find_home-style sweep: visits each position going up and then coming back
+    down, waits for the axis to stop and records where it settled.
+
+    The settled position is read from the axis telemetry (angle minus origin,
+    times radius), so it captures loop and direction-dependent errors of the
+    drive. Replace measured_mm with an external measurement (dial gauge,
+    camera) to also calibrate the pulley scale.
+
+    A point where the axis does not settle within `timeout` is left out of
+    the arrays (its position was still changing) and reported instead.
+
+    Returns:
+        dict: "commanded_mm", "measured_mm" and "direction" arrays, and
+        "skipped", a list of (commanded_mm, direction) that timed out.
+    """
+    positions_mm = sorted(positions_mm)
+    plan = [(p, 1) for p in positions_mm] + [(p, -1) for p in reversed(positions_mm)]
+    commanded, measured, direction, skipped = [], [], [], []
+    # Approach the first point from below
+    axis.set_target_angle_rad(round(positions_mm[0]/axis.radius, 4) - 0.5)
+    _wait_settled(axis, settle_velocity, settle_time, timeout)
+    for pos, d in plan:
+        axis.set_target_angle_rad(round(pos/axis.radius, 4))
+        if not _wait_settled(axis, settle_velocity, settle_time, timeout):
+            print(f"Skipping {pos} mm (direction {d:+d}): axis did not settle within {timeout} s")
+            skipped.append((pos, d))
+            continue
+        commanded.append(pos)
+        measured.append((axis.angle - axis.origin)*axis.radius)
+        direction.append(d)
+    return {"commanded_mm": np.array(commanded), "measured_mm": np.array(measured), "direction": np.array(direction),
+            "skipped": skipped}
+
+
+def _wait_settled(axis, settle_velocity, settle_time, timeout):
+    deadline = time.monotonic() + timeout
+    still_since = None
+    while time.monotonic() < deadline:
+        axis.update_telemetry()
+        if abs(axis.velocity) < settle_velocity:
+            still_since = still_since or time.monotonic()
+            if time.monotonic() - still_since >= settle_time:
+                return True
+        else:
+            still_since = None
+    return False
+
+
+def calibrate_axis(axis, positions_mm, directory=CALIBRATION_DIR):
+    """
+    Sweeps the axis, fits a calibration, stores it for the axis' serial
+    number and applies it. The axis must be homed first.
+
+    Returns:
+        tuple: (AxisCalibration, residual RMS in mm)
+    """
+    axis.calibration = AxisCalibration(sn=axis.sn)  # sweep with the raw mapping
+    data = sweep(axis, positions_mm)
+    if len(data["commanded_mm"]) < 3:
+        raise RuntimeError(f"Only {len(data['commanded_mm'])} sweep points settled, "
+                           f"{len(data['skipped'])} timed out; not enough to fit a calibration")
+    calibration, rms = fit_calibration(data["commanded_mm"], data["measured_mm"], data["direction"], sn=axis.sn)
+    calibration.save(directory)
+    axis.calibration = calibration
+    return calibration, rms
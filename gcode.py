@@ -57,25 +57,41 @@
 # |----------|------------------|--------------|
 # | M
 
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, List
+
 import numpy as np
-import re
-import math
-import time
-from typing import List, Dict, Tuple, Optional, Any
-import xml.etree.ElementTree as ET
-from html import escape
-import base64
-from shapely import Polygon
+
+from toolpath import Toolpath
+from preview_cache import PREVIEW_CACHE_DIR, load_preview
+
+if TYPE_CHECKING:
+    from shapely import Polygon
+
+# matplotlib is only needed for previews, so it is imported inside
+# animate_gcode/plot_gcode_and_polygons rather than at module import.
 
 class GCode:
-    def __init__(self, filename="output.gcode"):
+    # Where parsed previews of G-code files are cached, None to always re-parse
+    preview_cache_dir = PREVIEW_CACHE_DIR
+
+    def __init__(self, filename="output.gcode", stream=False):
         """
         Initialize a GCode object with a file to store G-code commands.
+
+        With stream=True every line is written to the file as it is added and
+        not kept in memory, so output size does not bound memory; call save()
+        to close the file.
         """
         self.filename = filename
         self.commands = []
+        self.line_count = 0
+        self._file = open(filename, "w") if stream else None
+        self._tool_state = False
+        # Emitted motion as (points, tool_on) chunks, kept for the plotters unless streaming
+        self._chunks = None if stream else []
         self._add_line("G21")  # Set units to millimeters
         self._add_line("G90")  # Absolute positioning
         self._add_line("G0 X0 Y0 Z10")  # Move to start position
@@ -85,31 +101,93 @@ class GCode:
         """
         Add a single G-code command to the list.
         """
-        self.commands.append(command)
+        if self._file:
+            self._file.write(f"\n{command}" if self.line_count else command)
+        else:
+            self.commands.append(command)
+        self.line_count += 1
 
     def set_location(self, x, y, feed = 800):
         x = round(x,3)
         y = round(y,3)
+        if self._chunks is not None:
+            self._chunks.append((np.array([self.location, (x, y)], dtype=float), self._tool_state))
         self.location = (x,y)
         self._add_line(f"G1 X{x} Y{y} F{feed}")
 
     def add_array(self, array, feed = 800):
         if array:
-            for idx, toolpath in enumerate(array): #individual contour
+            self.add_toolpath(Toolpath.from_arrays(array, feed=feed))
+
+    def add_toolpath(self, toolpath: Toolpath):
+        """
+        Emit a Toolpath. Spraying segments get a tool-off move to their first
+        point before the tool is switched on; other segments are travel moves.
+        """
+        for i in range(len(toolpath)):
+            points = np.round(toolpath[i], 3)
+            if not len(points):
+                continue
+            feed = f"{toolpath.feed[i]:g}"
+            if toolpath.tool_on[i]:
                 # Move with tool off
                 self.tool_on(False)
-                self.set_location(x=toolpath[0][0],y=toolpath[0][1])
+                self.set_location(x=points[0][0],y=points[0][1])
                 self.tool_on(True)
-                for step in toolpath:
-                    self.set_location(x=step[0],y=step[1])
+            elif self._tool_state:
+                self.tool_on(False)
+            if self._chunks is not None:
+                self._chunks.append((np.vstack([self.location, points]), self._tool_state))
+            for x, y in points.tolist():
+                self._add_line(f"G1 X{x} Y{y} F{feed}")
+            self.location = tuple(points[-1].tolist())
+
+    def toolpath(self) -> Toolpath:
+        """
+        The emitted motion as a Toolpath, without parsing the G-code text.
+        Streamed output, or a GCode that emitted no moves, is read from the file
+        through the preview cache.
+        """
+        if not self._chunks:
+            if os.path.exists(self.filename):
+                if self.preview_cache_dir:
+                    return load_preview(self.filename, self.preview_cache_dir)[0]
+                return Toolpath.from_gcode(self.filename)
+            return Toolpath.empty()
+        # Merge consecutive chunks with the same tool state into one segment
+        points, states = zip(*self._chunks)
+        states = np.array(states)
+        starts = np.flatnonzero(np.concatenate([[True], states[1:] != states[:-1]]))
+        ends = np.append(starts[1:], len(points))
+        segments = [np.concatenate([points[start][:1]] + [p[1:] for p in points[start:end]])
+                    for start, end in zip(starts, ends)]
+        return Toolpath.from_arrays(segments).with_tool_state(states[starts])
 
     def tool_on(self,tool_on: bool):
+        self._tool_state = tool_on
         self._add_line(f"{'M3 S1' if tool_on else 'M5'}")
 
+    def tool_change(self, tool: int, width=None):
+        """
+        Switch the spray off and change to tool number `tool` (M6 T#). The
+        spray width in mm, if given, is written as a comment.
+        """
+        if self._tool_state:
+            self.tool_on(False)
+        self._add_line(f"M6 T{tool}" + (f" ; {width:g} mm" if width else ""))
+
     def save(self):
         """
-        Save the G-code commands to the file.
+        Save the G-code commands to the file. The tool is switched off at the end.
         """
+        if self._tool_state:
+            self.tool_on(False)
+        if self._file:
+            self._file.close()
+            self._file = None
+            return
+        if self.line_count and not self.commands:
+            return  # streamed and already closed
         with open(self.filename, "w") as f:
             f.write("\n".join(self.commands))
 
@@ -119,7 +197,7 @@ class GCode:
         """
         print("\n".join(self.commands))
 
-    def animate_gcode(self, output_file=None, dpi=100, interval=1, figsize=(5, 4),polygons:List[Polygon]=None):
+    def animate_gcode(self, output_file=None, dpi=100, interval=1, figsize=(5, 4),polygons:List[Polygon]=None, frames=600):
         """
         Animates G-code file showing the tool path.
         
@@ -129,66 +207,30 @@ class GCode:
         dpi (int): Resolution of the output animation
         interval (int): Interval between frames in milliseconds
         figsize (tuple): Size of the figure in inches
+        frames (int): Number of frames to render, whatever the size of the job. The
+            toolpath is drawn at the level of detail of the output resolution and
+            each frame advances by an equal share of its points.
         
         Returns:
         matplotlib.animation.Animation: Animation object
         """
-        # Read G-code file
-        with open(self.filename, 'r') as file:
-            lines = file.readlines()
-        
-        # Initialize variables
-        path_segments = []
-        current_segment = {'x': [], 'y': [], 'tool_state': None}
-        
-        current_x, current_y = 0, 0
-        current_tool_state = 0
-        
-        # Parse G-code
-        for line in lines:
-            line = line.strip()
-            
-            # Check for tool on/off
-            if line.startswith('M3'):
-                if current_segment['x'] and current_segment['tool_state'] != 1:
-                    path_segments.append(current_segment)
-                    current_segment = {'x': [current_x], 'y': [current_y], 'tool_state': 1}
-                current_tool_state = 1
-                if not current_segment['x']:
-                    current_segment['tool_state'] = 1
-                    
-            elif line.startswith('M5'):
-                if current_segment['x'] and current_segment['tool_state'] != 0:
-                    path_segments.append(current_segment)
-                    current_segment = {'x': [current_x], 'y': [current_y], 'tool_state': 0}
-                current_tool_state = 0
-                if not current_segment['x']:
-                    current_segment['tool_state'] = 0
-            
-            # Check for movement
-            elif line.startswith('G1'):
-                x_match = re.search(r'X([-\d.]+)', line)
-                y_match = re.search(r'Y([-\d.]+)', line)
-                
-                if x_match:
-                    current_x = float(x_match.group(1))
-                if y_match:
-                    current_y = float(y_match.group(1))
-                
-                current_segment['x'].append(current_x)
-                current_segment['y'].append(current_y)
-        
-        if current_segment['x']:
-            path_segments.append(current_segment)
-        
-        all_x = [x for segment in path_segments for x in segment['x']]
-        all_y = [y for segment in path_segments for y in segment['y']]
-        
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+        from lod import LODPyramid
+
+        toolpath = self.toolpath()
+        bounds = toolpath.bounds()
+        if bounds is not None:
+            pyramid = LODPyramid(toolpath)
+            pixel = max(bounds[2] - bounds[0], bounds[3] - bounds[1])/(max(figsize)*dpi)
+            toolpath = pyramid.level(pyramid.level_for(pixel))
+        path_segments = [{'x': seg[:, 0], 'y': seg[:, 1], 'tool_state': int(state)}
+                         for seg, state in zip(toolpath, toolpath.tool_on)]
+
         fig, ax = plt.subplots(figsize=figsize)
 
-        if all_x and all_y:
-            x_min, x_max = min(all_x), max(all_x)
-            y_min, y_max = min(all_y), max(all_y)
+        if bounds is not None:
+            x_min, y_min, x_max, y_max = bounds
             
             x_range = max(0.1, x_max - x_min)
             y_range = max(0.1, y_max - y_min)
@@ -221,8 +263,10 @@ class GCode:
         ax.legend(loc="upper right")#, bbox_to_anchor=(1, 1))
         
         total_points = sum(len(segment['x']) for segment in path_segments)
+        segment_ends = np.cumsum([len(segment['x']) for segment in path_segments])
+        n_frames = max(1, min(frames, total_points))
         
-        for polygon in polygons:
+        for polygon in polygons or []:
             x, y = polygon.exterior.xy
             ax.fill(x,y, color='green', alpha=0.3)
 
@@ -232,40 +276,39 @@ class GCode:
             current_point.set_data([], [])
             return [*line_objects, current_point]
 
+        drawn = [0]  # segments before this index are fully drawn
+
         def update(frame):
-            points_seen = 0
-            current_segment_idx = 0
-            current_point_idx = 0
-            
-            for i, segment in enumerate(path_segments):
-                if points_seen + len(segment['x']) > frame:
-                    current_segment_idx = i
-                    current_point_idx = frame - points_seen
-                    break
-                points_seen += len(segment['x'])
-            
-            for i, (line, segment) in enumerate(zip(line_objects, path_segments)):
-                if i < current_segment_idx:
-                    line.set_data(segment['x'], segment['y'])
-                elif i == current_segment_idx:
-                    line.set_data(
-                        segment['x'][:current_point_idx + 1],
-                        segment['y'][:current_point_idx + 1]
-                    )
-                else:
+            # Point reached at the end of this frame
+            point = (frame + 1)*total_points//n_frames - 1
+            current_segment_idx = int(np.searchsorted(segment_ends, point, side='right'))
+            current_point_idx = point - (segment_ends[current_segment_idx - 1] if current_segment_idx else 0)
+
+            if frame == 0 or current_segment_idx < drawn[0]:
+                drawn[0] = 0
+                for line in line_objects:
                     line.set_data([], [])
-            
+            for i in range(drawn[0], min(current_segment_idx, len(path_segments))):
+                line_objects[i].set_data(path_segments[i]['x'], path_segments[i]['y'])
+            drawn[0] = current_segment_idx
+            if current_segment_idx < len(path_segments):
+                segment = path_segments[current_segment_idx]
+                line_objects[current_segment_idx].set_data(
+                    segment['x'][:current_point_idx + 1],
+                    segment['y'][:current_point_idx + 1]
+                )
+
             if current_segment_idx < len(path_segments) and current_point_idx < len(path_segments[current_segment_idx]['x']):
                 current_x = path_segments[current_segment_idx]['x'][current_point_idx]
                 current_y = path_segments[current_segment_idx]['y'][current_point_idx]
                 current_point.set_data([current_x], [current_y])
             
-            ax.set_title(f'G-code Animation (Progress: {frame+1}/{total_points})')
+            ax.set_title(f'G-code Animation (Progress: {point+1}/{total_points})')
             
             return [*line_objects, current_point]
         
         anim = animation.FuncAnimation(
-            fig, update, frames=total_points,
+            fig, update, frames=n_frames,
             init_func=init, blit=True, interval=interval
         )
 
@@ -288,53 +331,24 @@ class GCode:
         ensuring equal scaling on both axes, with different colors for tool on/off states.
 
         Parameters:
-            gcode_commands (list of str): List of G-code commands as strings.
             shapely_polygons (list of shapely.geometry.Polygon or shapely.geometry.MultiPolygon, optional):
                 List of Shapely polygon objects to overlay on the plot.
                 Defaults to None.
         """
-        x, y, colors = [], [], []
-        tool_on = False
-        current_x, current_y = 0, 0
-
-        # Define G-code command prefixes for movement and tool control
-        movement_commands = ('G0', 'G1')
-        tool_on_commands = ('M3', 'M4')
-        tool_off_commands = ('M5',)
-
-        for command in self.commands:
-            parts = command.strip().split()
-            if not parts:
-                continue
+        import matplotlib.pyplot as plt
+        from lod import LODPyramid, attach_lod
+
+        pyramid = LODPyramid(self.toolpath())
 
-            cmd = parts[0]
-            params = {p[0]: float(p[1:]) for p in parts[1:]}
-
-            # Update tool state
-            if cmd in tool_on_commands:
-                tool_on = True
-            elif cmd in tool_off_commands:
-                tool_on = False
-
-            # Process movement commands
-            if cmd in movement_commands:
-                new_x = params.get('X', current_x)
-                new_y = params.get('Y', current_y)
-                if new_x != current_x or new_y != current_y:
-                    x.append([current_x, new_x])
-                    y.append([current_y, new_y])
-                    colors.append('red' if tool_on else 'blue')
-                current_x, current_y = new_x, new_y
-
-        # Plotting
+        # Plotting: only the visible segments, at the level of detail of the
+        # current zoom, redrawn whenever the view changes
         fig, ax = plt.subplots()
-        for i in range(len(x)):
-            ax.plot(x[i], y[i], color=colors[i])
+        attach_lod(ax, pyramid)
 
         # Overlay Shapely polygons if provided
         if shapely_polygons:
             for polygon in shapely_polygons:
-                if isinstance(polygon, Polygon):
+                if polygon.geom_type == 'Polygon':
                     x, y = polygon.exterior.xy
                     ax.fill(x, y, alpha=0.5, color='gray')
 
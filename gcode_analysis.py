@@ -0,0 +1,179 @@
+import argparse
+import json
+import re
+
+import numpy as np
+
+# Defaults matching spin_servos: Axis.radius, the velocity limit main() sets after homing,
+# and the margin Gantry.set_xy subtracts from it. ArduinoControl off() delays 500 ms on
+# the board, but Tool.tool_off only writes the command and returns, so the gantry does
+# not wait for it and the off delay adds no wall time by default.
+AXIS_RADIUS_MM = 6.4
+VELOCITY_LIMIT_RAD_S = 50
+VELOCITY_MARGIN_RAD_S = 10
+TOOL_ON_DELAY_S = 0.0
+TOOL_OFF_DELAY_S = 0.0
+PURGE_S = 2.0
+PURGE_POSITION = (0.0, 500.0)
+
+# Gantry.run_gcode executes only G1 moves; G0 lines such as the header's
+# "G0 X0 Y0 Z10" never move the machine.
+_LINE_RE = re.compile(
+    r"^[ \t]*(G0?1|M[3456])\b([^\n;]*)",
+    re.MULTILINE,
+)
+_AXIS_RE = re.compile(r"([XY])(-?[\d.]+)")
+
+MOVE, TOOL_ON, TOOL_OFF, TOOL_CHANGE = 0, 1, 2, 3
+_KINDS = {"M3": TOOL_ON, "M4": TOOL_ON, "M5": TOOL_OFF, "M6": TOOL_CHANGE}
+
+
+def load_gcode(filename):
+    """
+    Loads the moves and tool switches of a G-code file into arrays.
+
+    Only G1 moves, M3/M4/M5 tool commands and M6 tool changes are kept;
+    missing X or Y words carry the previous value forward, as they do on the
+    machine. A tool change switches the tool off, like Gantry.change_tool.
+
+    Returns:
+        dict: "x", "y" (float64 positions after each move), "tool_on" (bool
+        tool state during each move), "tool_switches" and the "switches_on" /
+        "switches_off" counts it is made of, and "tool_changes" (index of the
+        first move after each M6).
+    """
+    with open(filename, "r") as f:
+        text = f.read()
+
+    matches = _LINE_RE.findall(text)
+    if not matches:
+        empty = np.zeros(0)
+        return {"x": empty, "y": empty, "tool_on": empty.astype(bool), "tool_switches": 0,
+                "switches_on": 0, "switches_off": 0, "tool_changes": np.zeros(0, dtype=np.int64)}
+
+    kinds = np.array([MOVE if cmd[0] == "G" else _KINDS[cmd] for cmd, _ in matches])
+    n = len(kinds)
+    x = np.full(n, np.nan)
+    y = np.full(n, np.nan)
+    for i, (cmd, params) in enumerate(matches):
+        if cmd[0] == "G":
+            for axis, value in _AXIS_RE.findall(params):
+                if axis == "X":
+                    x[i] = float(value)
+                else:
+                    y[i] = float(value)
+
+    # Forward fill positions (machine starts at 0, 0) and tool state (starts off)
+    x = _forward_fill(x, 0.0)
+    y = _forward_fill(y, 0.0)
+    is_tool = kinds != MOVE
+    state = np.where(is_tool, kinds == TOOL_ON, False)
+    last_tool = np.maximum.accumulate(np.where(is_tool, np.arange(n), -1))
+    tool_on = np.where(last_tool >= 0, state[np.maximum(last_tool, 0)], False)
+
+    # A switch is any tool command that changes the state
+    changes = np.diff(np.concatenate([[False], state[is_tool]]).astype(np.int8))
+    switches_on = int(np.count_nonzero(changes > 0))
+    switches_off = int(np.count_nonzero(changes < 0))
+
+    moves = ~is_tool
+    tool_changes = np.cumsum(moves)[kinds == TOOL_CHANGE]
+    return {"x": x[moves], "y": y[moves], "tool_on": tool_on[moves],
+            "tool_switches": switches_on + switches_off, "switches_on": switches_on, "switches_off": switches_off,
+            "tool_changes": tool_changes}
+
+
+def _forward_fill(values, initial):
+    idx = np.where(np.isnan(values), -1, np.arange(len(values)))
+    idx = np.maximum.accumulate(idx)
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], initial)
+
+
+def analyze_gcode(filename, velocity_limit=VELOCITY_LIMIT_RAD_S, radius=AXIS_RADIUS_MM,
+                  velocity_margin=VELOCITY_MARGIN_RAD_S, tool_on_delay=TOOL_ON_DELAY_S,
+                  tool_off_delay=TOOL_OFF_DELAY_S, purge=PURGE_S):
+    """
+    Estimates distances and run time of a G-code file without the machine.
+
+    The time model follows Gantry.set_xy: both axes move at once, so each move
+    takes as long as its longest axis at (velocity_limit - velocity_margin) rad/s
+    on a pulley of the given radius. Relay delays are added per tool switch and
+    the purge run_gcode performs before the job is included if purge > 0.
+    Every M6 adds what Gantry.change_tool does: travel to the purge position
+    and back and a purge with its relay delays. The operator's time to fit
+    the tool is not included.
+
+    Parameters:
+        filename (str): G-code file to analyze.
+        velocity_limit (float): Axis velocity limit in rad/s.
+        radius (float): Axis pulley radius in mm.
+        velocity_margin (float): Amount Gantry.set_xy subtracts from the limit.
+        tool_on_delay (float): Seconds for the tool relay to switch on.
+        tool_off_delay (float): Seconds for the tool relay to switch off.
+        purge (float): Purge spray time in seconds, 0 to skip the purge
+            before the job (tool changes then only add travel and relay delays).
+
+    Returns:
+        dict: cutting/travel length in mm, move and tool switch counts, and
+        the estimated time in seconds.
+    """
+    data = load_gcode(filename)
+    x, y, tool_on = data["x"], data["y"], data["tool_on"]
+    # Each tool change purges at PURGE_POSITION before the next move
+    changes = data["tool_changes"]
+    x = np.insert(x, changes, PURGE_POSITION[0])
+    y = np.insert(y, changes, PURGE_POSITION[1])
+    tool_on = np.insert(tool_on, changes, False)
+    start = PURGE_POSITION if purge > 0 else (0.0, 0.0)
+    dx = np.abs(np.diff(x, prepend=start[0]))
+    dy = np.abs(np.diff(y, prepend=start[1]))
+    length = np.hypot(dx, dy)
+
+    speed = (velocity_limit - velocity_margin) * radius  # mm/s
+    move_time = np.maximum(dx, dy) / speed
+    tool_time = data["switches_on"] * tool_on_delay + data["switches_off"] * tool_off_delay
+    purges = int(purge > 0) + len(changes)
+    purge_time = purges * (purge + tool_on_delay + tool_off_delay)
+
+    return {
+        "moves": int(len(x) - len(changes)),
+        "cutting_length_mm": float(length[tool_on].sum()),
+        "travel_length_mm": float(length[~tool_on].sum()),
+        "tool_switches": data["tool_switches"],
+        "tool_changes": len(changes),
+        "motion_time_s": float(move_time.sum()),
+        "tool_time_s": float(tool_time),
+        "purge_time_s": float(purge_time),
+        "estimated_time_s": float(move_time.sum() + tool_time + purge_time),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate machine time and distances of G-code files.")
+    parser.add_argument("files", nargs="+", help="G-code files to analyze")
+    parser.add_argument("--velocity-limit", type=float, default=VELOCITY_LIMIT_RAD_S, help="Axis velocity limit in rad/s")
+    parser.add_argument("--radius", type=float, default=AXIS_RADIUS_MM, help="Axis pulley radius in mm")
+    parser.add_argument("--tool-on-delay", type=float, default=TOOL_ON_DELAY_S, help="Tool relay on delay in s")
+    parser.add_argument("--tool-off-delay", type=float, default=TOOL_OFF_DELAY_S, help="Tool relay off delay in s (the gantry does not wait for it by default)")
+    parser.add_argument("--purge", type=float, default=PURGE_S, help="Purge time in s, 0 to skip")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for filename in args.files:
+        results[filename] = analyze_gcode(filename, args.velocity_limit, args.radius,
+                                          tool_on_delay=args.tool_on_delay,
+                                          tool_off_delay=args.tool_off_delay, purge=args.purge)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for filename, res in results.items():
+        minutes, seconds = divmod(res["estimated_time_s"], 60)
+        print(f"{filename}: {res['moves']} moves, cut {res['cutting_length_mm']:.1f} mm, "
+              f"travel {res['travel_length_mm']:.1f} mm, {res['tool_switches']} tool switches, "
+              f"{res['tool_changes']} tool changes, "
+              f"~{int(minutes)}m{seconds:04.1f}s")
+
+
+if __name__ == "__main__":
+    main()
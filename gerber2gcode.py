@@ -1,66 +1,227 @@
-from pygerber.gerberx3.api.v2 import GerberFile, FileTypeEnum, Project, ParsedFile, GerberFileInfo
-from pygerber.gerberx3.parser2.command_buffer2 import CommandBuffer2
-from pygerber.gerberx3.parser2.commands2.arc2 import CCArc2
-from pygerber.gerberx3.parser2.commands2.line2 import Line2
-from pygerber.gerberx3.parser2.commands2.flash2 import Flash2
-from pygerber.gerberx3.parser2.commands2.region2 import Region2
-from pygerber.gerberx3.parser2.commands2.aperture_draw_command2 import ApertureDrawCommand2
-import matplotlib.pyplot as plt
-from shapely import Polygon
-from helpers import add_polygon_to_plot, recur_is_bounded
-
-outline_gerber = GerberFile.from_file("./gerbers/1930238-00-D_02-1.GM1",FileTypeEnum.INFER_FROM_ATTRIBUTES)
-mask_gerber = GerberFile.from_file("./gerbers/1930238-00-D_02-1.GM10",FileTypeEnum.INFER_FROM_ATTRIBUTES)
-
-outline_info = outline_gerber.parse().get_info()
-
-parsed_outline = mask_gerber.parse()
-
-custom_command_buffer_solid: CommandBuffer2 = CommandBuffer2()
-custom_command_buffer_hatch: CommandBuffer2 = CommandBuffer2()
-
-# FORM THE HATCH AND SOLID COMMAND BUFFERS
-for command in parsed_outline._command_buffer:
-    if recur_is_bounded(command=command,bounding_info=outline_info):
-        if isinstance(command,Line2) or isinstance(command,CCArc2):
-            custom_command_buffer_hatch.add_command(command)
-
-for command in parsed_outline._command_buffer:
-    if recur_is_bounded(command=command,bounding_info=outline_info):
-        if isinstance(command,Region2) or isinstance(command,Flash2):
-            custom_command_buffer_solid.add_command(command)
-
-fig, ax = plt.subplots(figsize=(8, 8))
-plt.gca().set_aspect('equal', adjustable='box')
-
-polys = []
-for command in parsed_outline._command_buffer:
-    if recur_is_bounded(command=command,bounding_info=outline_info):
-        if isinstance(command,Region2):
-            coordinates = []
-            for cmd in command.command_buffer:
-                cmd: Line2
-                coordinates.append((cmd.start_point.x.value,cmd.start_point.y.value))
-            polys.append(Polygon(coordinates))
-            add_polygon_to_plot(Polygon(coordinates), ax, color='red', alpha=0.5)
-
-plt.show()
-exit()
-
-custom_readonly_command_buffer_hatch = custom_command_buffer_hatch.get_readonly()
-custom_parsed_hatch = ParsedFile(
-        GerberFileInfo.from_readonly_command_buffer(custom_readonly_command_buffer_hatch),
-        custom_readonly_command_buffer_hatch,
-        FileTypeEnum.EDGE,
-    )
-custom_parsed_hatch.render_raster("test_hatch.png")
-custom_parsed_hatch.render_svg("test_hatch.svg")
-
-custom_readonly_command_buffer_solid = custom_command_buffer_solid.get_readonly()
-custom_parsed_solid = ParsedFile(
-        GerberFileInfo.from_readonly_command_buffer(custom_readonly_command_buffer_solid),
-        custom_readonly_command_buffer_solid,
-        FileTypeEnum.EDGE,
-    )
-custom_parsed_solid.render_raster("test_solid.png")
-custom_parsed_solid.render_svg("test_solid.svg")
\ No newline at end of file
+import argparse
+
+import numpy as np
+import shapely
+from pocketing import pocketing
+from helpers import recur_is_bounded, repair_polygons, sort_polygons_by_min_x
+from gcode import GCode
+from profiling import Profiler, polygon_vertex_count
+from toolpath import Toolpath
+from incremental import incremental_toolpaths
+from tiling import RegionIndex, make_tiles, iter_tile_polygons
+from tool_planning import plan_tools
+
+TOOLHEAD = 1
+OUTLINE_FILE = "./gerbers/1930238-00-D_02-1.GM1"
+MASK_FILE = "./gerbers/1930238-00-D_02-1.GM10"
+OUTPUT_FILE = "./outputs/gerber.gcode"
+
+
+def parse_gerbers(outline_file, mask_file):
+    """
+    Parse the outline and mask Gerber files.
+
+    Returns:
+        tuple: (outline GerberFileInfo, parsed mask ParsedFile)
+    """
+    from pygerber.gerberx3.api.v2 import GerberFile, FileTypeEnum
+
+    outline_gerber = GerberFile.from_file(outline_file,FileTypeEnum.INFER_FROM_ATTRIBUTES)
+    mask_gerber = GerberFile.from_file(mask_file,FileTypeEnum.INFER_FROM_ATTRIBUTES)
+
+    outline_info = outline_gerber.parse().get_info()
+    parsed_outline = mask_gerber.parse()
+    return outline_info, parsed_outline
+
+
+def bounded_regions(parsed_outline, outline_info):
+    """
+    Returns the Region2 commands of the mask that lie within the outline.
+    """
+    from pygerber.gerberx3.parser2.commands2.region2 import Region2
+
+    return [command for command in parsed_outline._command_buffer
+            if recur_is_bounded(command=command,bounding_info=outline_info) and isinstance(command,Region2)]
+
+
+def regions_to_polygons(regions):
+    """
+    Converts Region2 commands to Shapely polygons using the start point of each line.
+
+    The start points of all regions go into one coordinate array; the rings
+    are built from it in a single shapely.linearrings call. Invalid
+    (self-intersecting) outlines are repaired and split into their Polygon
+    parts, so one region can give several polygons.
+    """
+    if not regions:
+        return []
+    lengths = [len(command.command_buffer) for command in regions]
+    coordinates = np.array([(cmd.start_point.x.value, cmd.start_point.y.value)
+                            for command in regions for cmd in command.command_buffer], dtype=float)
+    rings = shapely.linearrings(coordinates, indices=np.repeat(np.arange(len(regions)), lengths))
+    return repair_polygons(shapely.polygons(rings)).tolist()
+
+
+def buffer_polygons(polygons, toolhead=TOOLHEAD):
+    """
+    Shrinks each polygon by half the toolhead width so the spray stays inside the pad.
+    """
+    if not len(polygons):
+        return []
+    return shapely.buffer(np.asarray(polygons, dtype=object), -toolhead/2, quad_segs=16, join_style="round").tolist()
+
+
+def pocket_polygon(polygon, toolhead=TOOLHEAD):
+    """
+    Contour-parallel pocketing of one polygon as a Toolpath.
+    """
+    return Toolpath.from_arrays(pocketing.contour.contour_parallel(polygon, toolhead))
+
+
+def generate_toolpaths(polygons, toolhead=TOOLHEAD):
+    """
+    Pockets the polygons in order of their minimum x value.
+
+    Returns:
+        Toolpath: The contours of all polygons, one segment per contour.
+    """
+    return Toolpath.concatenate([pocket_polygon(poly, toolhead) for poly in sort_polygons_by_min_x(polygons)])
+
+
+def write_gcode(toolpath, output_file=OUTPUT_FILE):
+    gcode = GCode(output_file)
+    gcode.add_toolpath(toolpath)
+    gcode.save()
+    return gcode
+
+
+def write_gcode_passes(passes, tools, output_file=OUTPUT_FILE):
+    """
+    Emits per-tool passes, each preceded by a tool change to its number
+    (1-based position in `tools`).
+
+    Parameters:
+        passes (list of (float, Toolpath)): Tool width and its toolpath.
+        tools (list of float): Configured tool widths, as given by the user.
+    """
+    gcode = GCode(output_file)
+    for tool, toolpath in passes:
+        gcode.tool_change(tools.index(tool) + 1, tool)
+        gcode.add_toolpath(toolpath)
+    gcode.save()
+    return gcode
+
+
+def write_gcode_tiled(regions, outline_info, tile_size, toolhead=TOOLHEAD, output_file=OUTPUT_FILE, profiler=None):
+    """
+    Pockets and emits the board one tile at a time, streaming G-code to disk.
+
+    Only the polygons and toolpaths of the current tile are held in memory.
+    Each feature is pocketed whole by the tile owning its min corner, so
+    features crossing tile seams are covered the same as untiled.
+    """
+    profiler = profiler or Profiler()
+    bounds = (outline_info.min_x_mm, outline_info.min_y_mm, outline_info.max_x_mm, outline_info.max_y_mm)
+    with profiler.span("index"):
+        index = RegionIndex(regions)
+        if len(regions):
+            # recur_is_bounded only checks max_y, so regions can stick out of the outline
+            # to the left, right or below; the tiles have to cover them too
+            bounds = (min(float(bounds[0]), index.bounds[:, 0].min()), min(float(bounds[1]), index.bounds[:, 1].min()),
+                      max(float(bounds[2]), index.bounds[:, 2].max()), max(float(bounds[3]), index.bounds[:, 3].max()))
+        tiles = make_tiles(bounds, tile_size)
+
+    gcode = GCode(output_file, stream=True)
+    for tile, polygons in iter_tile_polygons(index, tiles, toolhead/2):
+        profiler.count("tiles")
+        if not polygons:
+            continue
+        with profiler.span("pocketing"):
+            toolpath = generate_toolpaths(polygons, toolhead)
+        with profiler.span("gcode"):
+            gcode.add_toolpath(toolpath)
+        profiler.count("polygons", len(polygons))
+        profiler.count("toolpath_points", toolpath.n_points)
+    gcode.save()
+    return gcode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Gerber mask layer to spray G-code.")
+    parser.add_argument("--outline", default=OUTLINE_FILE, help="Board outline Gerber file")
+    parser.add_argument("--mask", default=MASK_FILE, help="Mask layer Gerber file")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="G-code output file")
+    parser.add_argument("--toolhead", type=float, default=TOOLHEAD, help="Spray width in mm")
+    parser.add_argument("--tools", type=float, nargs="+", metavar="WIDTH", help="Available spray widths in mm; "
+                        "each polygon is cleared with the widest tool that fits and the rest with smaller ones")
+    parser.add_argument("--tile-size", type=float, help="Process the board in square tiles of this size (mm) "
+                        "to bound memory on large panels")
+    parser.add_argument("--incremental", metavar="CACHE_DIR", help="Reuse toolpaths of unchanged polygons from "
+                        "the previous run stored in this directory")
+    parser.add_argument("--no-plot", action="store_true", help="Skip the toolpath preview")
+    parser.add_argument("--profile", metavar="REPORT.json", help="Write per-stage timings and counters to this file")
+    parser.add_argument("--cprofile", metavar="OUT.prof", help="Also capture a cProfile of the run (requires --profile)")
+    args = parser.parse_args()
+    if args.tile_size and args.incremental:
+        parser.error("--tile-size and --incremental cannot be combined")
+    if args.tools and (args.tile_size or args.incremental):
+        parser.error("--tools cannot be combined with --tile-size or --incremental")
+    if args.cprofile and not args.profile:
+        parser.error("--cprofile requires --profile")
+
+    profiler = Profiler(enabled=bool(args.profile), cprofile=bool(args.cprofile))
+    with profiler.span("parse"):
+        outline_info, parsed_outline = parse_gerbers(args.outline, args.mask)
+    with profiler.span("filter"):
+        regions = bounded_regions(parsed_outline, outline_info)
+    if args.tile_size:
+        gcode = write_gcode_tiled(regions, outline_info, args.tile_size, args.toolhead, args.output, profiler)
+        poly_originals = None
+    else:
+        with profiler.span("polygons"):
+            poly_originals = regions_to_polygons(regions)
+        if args.incremental:
+            with profiler.span("incremental"):
+                toolpath, stats = incremental_toolpaths(poly_originals, args.toolhead, args.incremental, pocket_polygon)
+            print(f"Reused {stats['reused']} polygons, recomputed {stats['computed']}, removed {stats['removed']}")
+            for name, value in stats.items():
+                profiler.count(f"incremental_{name}", value)
+        elif args.tools:
+            with profiler.span("plan"):
+                passes, uncovered = plan_tools(poly_originals, args.tools)
+            with profiler.span("pocketing"):
+                passes = [(tool, generate_toolpaths(polys, tool)) for tool, polys in passes]
+            for tool, tool_toolpath in passes:
+                print(f"Tool {args.tools.index(tool) + 1} ({tool:g} mm): {len(tool_toolpath)} contours")
+                profiler.count(f"toolpaths_{tool:g}mm", len(tool_toolpath))
+            print(f"Uncovered area: {uncovered.sum():.2f} mm^2")
+            toolpath = Toolpath.concatenate([tool_toolpath for _, tool_toolpath in passes])
+        else:
+            with profiler.span("buffer"):
+                polys = buffer_polygons(poly_originals, args.toolhead)
+            with profiler.span("pocketing"):
+                toolpath = generate_toolpaths(polys, args.toolhead)
+        with profiler.span("gcode"):
+            if args.tools:
+                gcode = write_gcode_passes(passes, args.tools, args.output)
+            else:
+                gcode = write_gcode(toolpath, args.output)
+
+        profiler.count("polygons", len(poly_originals))
+        profiler.count("polygon_vertices", polygon_vertex_count(poly_originals))
+        profiler.count("toolpaths", len(toolpath))
+        profiler.count("toolpath_points", toolpath.n_points)
+
+    if profiler.enabled:
+        profiler.count("regions", len(regions))
+        profiler.count("gcode_lines", gcode.line_count)
+        profiler.dump(args.profile, args.cprofile)
+        print(f"Profile written to {args.profile}")
+
+    if not args.no_plot:
+        gcode.plot_gcode_and_polygons(poly_originals)
+        # gcode.animate_gcode("./outputs/gerber.mp4",polygons=poly_originals)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,20 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from shapely.geometry import Point, Polygon
-import numpy as np
-from pygerber.gerberx3.parser2.command_buffer2 import CommandBuffer2
-from pygerber.gerberx3.parser2.commands2.arc2 import CCArc2
-from pygerber.gerberx3.parser2.commands2.line2 import Line2
-from pygerber.gerberx3.parser2.commands2.flash2 import Flash2
-from pygerber.gerberx3.parser2.commands2.region2 import Region2
-from pygerber.gerberx3.parser2.commands2.aperture_draw_command2 import ApertureDrawCommand2
-from pygerber.gerberx3.math.bounding_box import BoundingBox
-from pygerber.gerberx3.api.v2 import GerberFile, FileTypeEnum, Project, ParsedFile, GerberFileInfo
-
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import numpy as np
-import re
+
+if TYPE_CHECKING:
+    from pygerber.gerberx3.api.v2 import GerberFileInfo
+    from pygerber.gerberx3.parser2.commands2.aperture_draw_command2 import ApertureDrawCommand2
+
+# Plotting (matplotlib), clustering (sklearn) and the pygerber command classes are
+# imported inside the functions that need them so that `import helpers` stays cheap
+# for headless G-code conversion.
 
 def add_polygon_to_plot(polygon, ax, color='blue', alpha=0.5):
+    import matplotlib.patches as patches
+
     if polygon.is_empty:
         return
     if polygon.geom_type == 'Polygon':
@@ -24,7 +22,7 @@ def add_polygon_to_plot(polygon, ax, color='blue', alpha=0.5):
         patch = patches.Polygon(coords, closed=True, facecolor=color, edgecolor='black', alpha=alpha)
         ax.add_patch(patch)
     elif polygon.geom_type == 'MultiPolygon':
-        for poly in polygon:
+        for poly in polygon.geoms:
             add_polygon_to_plot(poly, ax, color, alpha)
 
 
@@ -33,6 +31,11 @@ def recur_is_bounded(command: ApertureDrawCommand2, bounding_info: GerberFileInf
     Check if each command is with the bounding box of the outline.
     Recursively checks all lines within regions.
     '''
+    from pygerber.gerberx3.parser2.commands2.arc2 import CCArc2
+    from pygerber.gerberx3.parser2.commands2.line2 import Line2
+    from pygerber.gerberx3.parser2.commands2.flash2 import Flash2
+    from pygerber.gerberx3.parser2.commands2.region2 import Region2
+
     if isinstance(command, Line2) or isinstance(command, CCArc2):
         if command.start_point.y.value<=bounding_info.max_y_mm or command.end_point.y.value<=bounding_info.max_y_mm:
             return True
@@ -44,6 +47,30 @@ def recur_is_bounded(command: ApertureDrawCommand2, bounding_info: GerberFileInf
         print(f"Command {command} not printed")
         return False
 
+def repair_polygons(polygons):
+    """
+    Repairs invalid (self-intersecting) polygons with make_valid and splits
+    the result into its Polygon parts, dropping any lines or points it leaves.
+    Valid polygons pass through unchanged and the order is kept.
+
+    Parameters:
+        polygons (array-like of shapely.geometry.Polygon): Polygons to check.
+
+    Returns:
+        ndarray: Valid shapely Polygons.
+    """
+    import shapely
+
+    polygons = np.asarray(polygons, dtype=object)
+    invalid = ~shapely.is_valid(polygons)
+    if not invalid.any():
+        return polygons
+    polygons = polygons.copy()
+    polygons[invalid] = shapely.make_valid(polygons[invalid])
+    parts = shapely.get_parts(polygons)
+    return parts[(shapely.get_type_id(parts) == shapely.GeometryType.POLYGON) & ~shapely.is_empty(parts)]
+
+
 def sort_polygons_by_min_x(polygons):
     """
     Sorts a list of Shapely polygons by their minimum x value.
@@ -54,8 +81,49 @@ def sort_polygons_by_min_x(polygons):
     Returns:
         list: Sorted list of Shapely polygons based on their minimum x value.
     """
-    # Sort the polygons by their minimum x value of the exterior coordinates
-    return sorted(polygons, key=lambda poly: min(poly.exterior.xy[0]))
+    import shapely
+
+    # One bounds call for the whole array instead of reading every exterior
+    polygons = np.asarray(polygons, dtype=object)
+    if not len(polygons):
+        return []
+    return polygons[np.argsort(shapely.bounds(polygons)[:, 0], kind="stable")].tolist()
+
+
+def cluster_points_to_polygons(points, eps=2, min_samples=2, buffer=0.2):
+    """
+    Groups hatch points with DBSCAN and closes each group into a polygon.
+
+    Parameters:
+        points (array-like): (N, 2) array of x, y points.
+        eps (float): DBSCAN neighbourhood radius, adjust based on your data.
+        min_samples (int): DBSCAN minimum samples per cluster.
+        buffer (float): Distance the angle-sorted outline of each group is grown by.
+
+    Returns:
+        tuple: (list of shapely.geometry.Polygon, ndarray of DBSCAN labels)
+    """
+    import shapely
+    from sklearn.cluster import DBSCAN
+
+    points = np.asarray(points, dtype=float)
+    labels = DBSCAN(eps=eps, min_samples=min_samples).fit_predict(points)
+
+    # At least 3 points are required to form a polygon; noise (-1) is ignored
+    counts = np.bincount(labels[labels >= 0])
+    keep = (labels >= 0) & (counts[np.maximum(labels, 0)] >= 3) if len(counts) else np.zeros(len(labels), dtype=bool)
+    if not keep.any():
+        return [], labels
+    group_points, group = points[keep], labels[keep]
+    # Sort each group counterclockwise around its centroid and connect the points
+    center = np.column_stack([np.bincount(group, weights=group_points[:, i], minlength=len(counts))
+                              for i in range(2)]) / np.maximum(counts, 1)[:, None]
+    angles = np.arctan2(group_points[:, 1] - center[group, 1], group_points[:, 0] - center[group, 0])
+    order = np.lexsort((angles, group))
+    _, ring_index = np.unique(group[order], return_inverse=True)
+    rings = shapely.linearrings(group_points[order], indices=ring_index)
+    polygons = shapely.buffer(shapely.polygons(rings), buffer, quad_segs=16, join_style="round")
+    return polygons.tolist(), labels
 
 
-# animate_gcode("./drawing.gcode","./animation.gif")
\ No newline at end of file
+# animate_gcode("./drawing.gcode","./animation.gif")
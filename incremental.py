@@ -0,0 +1,133 @@
+import hashlib
+import os
+
+import numpy as np
+import shapely
+
+from toolpath import Toolpath
+
+INDEX_FILE = "geometry_index.npz"
+
+
+def geometry_key(polygon, decimals=6):
+    """
+    Content hash of a polygon's exterior and interior rings, rounded so that
+    re-parsing the same Gerber gives the same key.
+    """
+    digest = hashlib.sha1()
+    rings = [polygon.exterior] + list(polygon.interiors)
+    for ring in rings:
+        digest.update(np.round(np.asarray(ring.coords, dtype=float), decimals).tobytes())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+class GeometryIndex():
+    def __init__(self, toolhead, keys=(), min_x=(), key_offsets=(0,), toolpath=None):
+        """
+        Stored result of a previous run: for each polygon key, the min x of its
+        buffered polygon (for ordering) and its range of segments in one
+        concatenated Toolpath.
+        """
+        self.toolhead = toolhead
+        self.keys = list(keys)
+        self.min_x = np.asarray(min_x, dtype=float)
+        self.key_offsets = np.asarray(key_offsets, dtype=np.int64)
+        self.toolpath = toolpath if toolpath is not None else Toolpath.empty()
+        self._lookup = {key: i for i, key in enumerate(self.keys)}
+
+    def __contains__(self, key):
+        return key in self._lookup
+
+    def get(self, key):
+        """
+        Returns (min_x, Toolpath view) stored for `key`.
+        """
+        i = self._lookup[key]
+        return self.min_x[i], self.toolpath[self.key_offsets[i]:self.key_offsets[i + 1]]
+
+    @classmethod
+    def load(cls, directory, toolhead):
+        """
+        Loads the index in `directory`. A missing index, or one made with a
+        different toolhead, gives an empty index so everything is recomputed.
+        """
+        path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return cls(toolhead)
+        with np.load(path) as data:
+            if float(data["toolhead"]) != float(toolhead):
+                return cls(toolhead)
+            toolpath = Toolpath(data["coords"], data["offsets"], data["tool_on"], data["feed"])
+            return cls(toolhead, data["keys"].tolist(), data["min_x"], data["key_offsets"], toolpath)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        tp = self.toolpath
+        np.savez(os.path.join(directory, INDEX_FILE), toolhead=self.toolhead,
+                 keys=np.array(self.keys, dtype="U40"), min_x=self.min_x, key_offsets=self.key_offsets,
+                 coords=tp.coords, offsets=tp.offsets, tool_on=tp.tool_on, feed=tp.feed)
+
+
+def incremental_toolpaths(polygons, toolhead, cache_dir, pocket):
+    """
+    Pockets only the polygons that changed since the last run in `cache_dir`.
+
+    Polygons are matched to the previous run by geometry_key. Unchanged ones
+    reuse their stored toolpath; added or changed ones are buffered and
+    pocketed with `pocket(polygon, toolhead)`. All toolpaths are then ordered
+    by the min x of their buffered polygon, as generate_toolpaths does, and
+    the index is replaced with the current geometry.
+
+    Parameters:
+        polygons (list of shapely.geometry.Polygon): Unbuffered mask polygons.
+        toolhead (float): Spray width in mm.
+        cache_dir (str): Directory holding the geometry index.
+        pocket (callable): Pocketing function returning a Toolpath.
+
+    Returns:
+        tuple: (ordered Toolpath, dict with "reused", "computed" and "removed" counts)
+    """
+    previous = GeometryIndex.load(cache_dir, toolhead)
+    entries = {}
+    order = []
+    new_keys, new_polygons = [], []
+    for poly in polygons:
+        key = geometry_key(poly)
+        order.append(key)
+        if key in entries:
+            continue
+        if key in previous:
+            entries[key] = previous.get(key)
+            continue
+        entries[key] = None
+        new_keys.append(key)
+        new_polygons.append(poly)
+
+    # Buffer every new or changed polygon in one call, as buffer_polygons does
+    buffered = shapely.buffer(np.array(new_polygons, dtype=object), -toolhead/2, quad_segs=16, join_style="round")
+    min_x = shapely.bounds(buffered)[:, 0]
+    for key, poly, x in zip(new_keys, buffered, min_x):
+        if shapely.is_empty(poly):
+            entries[key] = (np.inf, Toolpath.empty())
+        else:
+            entries[key] = (x, pocket(poly, toolhead))
+    computed = len(new_keys)
+
+    # Stable sort by min x, like sort_polygons_by_min_x
+    ranked = sorted(range(len(order)), key=lambda i: entries[order[i]][0])
+    ordered = Toolpath.concatenate([entries[order[i]][1] for i in ranked])
+
+    keys = list(entries)
+    lengths = [len(entries[key][1]) for key in keys]
+    index = GeometryIndex(toolhead, keys, [entries[key][0] for key in keys],
+                          np.concatenate([[0], np.cumsum(lengths)]),
+                          Toolpath.concatenate([entries[key][1] for key in keys]))
+    index.save(cache_dir)
+
+    stats = {
+        "reused": len(keys) - computed,
+        "computed": computed,
+        "removed": len(set(previous.keys) - set(keys)),
+    }
+    return ordered, stats
@@ -0,0 +1,139 @@
+import numpy as np
+import shapely
+
+from toolpath import Toolpath
+
+
+def simplify_toolpath(toolpath: Toolpath, tolerance):
+    """
+    Douglas-Peucker simplification of every segment in one shapely call.
+
+    Segments with fewer than two points draw nothing and are dropped.
+    Tool state and feed of the remaining segments are kept.
+    """
+    lengths = np.diff(toolpath.offsets)
+    drawable = np.flatnonzero(lengths >= 2)
+    if not len(drawable):
+        return Toolpath.empty()
+    index = np.repeat(np.arange(len(drawable)), lengths[drawable])
+    coords = np.concatenate([toolpath[i] for i in drawable])
+    lines = shapely.simplify(shapely.linestrings(coords, indices=index), tolerance, preserve_topology=False)
+    points, line_index = shapely.get_coordinates(lines, return_index=True)
+    offsets = np.zeros(len(drawable) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(line_index, minlength=len(drawable)), out=offsets[1:])
+    return Toolpath(points, offsets, toolpath.tool_on[drawable], toolpath.feed[drawable])
+
+
+class LODPyramid():
+    def __init__(self, toolpath: Toolpath, levels=8, base_tolerance=None):
+        """
+        Multi-resolution copies of a toolpath for previews.
+
+        Level 0 is the full toolpath; level i is simplified from level 0 with
+        base_tolerance * 2**(i - 1) mm, where base_tolerance defaults to
+        1/4096 of the larger extent, roughly a pixel on a large screen.
+        Levels and their segment bounding boxes (used to skip what is off
+        screen) are built the first time they are asked for.
+        """
+        bounds = toolpath.bounds()
+        self.bounds = bounds
+        extent = max(bounds[2] - bounds[0], bounds[3] - bounds[1], 1e-9) if bounds else 1.0
+        self.base_tolerance = base_tolerance or extent/4096
+        self.tolerances = [0.0] + [self.base_tolerance*2**(i - 1) for i in range(1, levels)]
+        self._levels = {0: toolpath}
+        self._boxes = {}
+
+    def level(self, index):
+        """
+        Toolpath at level `index`. Simplifying from level 0 rather than the
+        previous level keeps its error within that level's tolerance.
+        """
+        if index not in self._levels:
+            self._levels[index] = simplify_toolpath(self._levels[0], self.tolerances[index])
+        return self._levels[index]
+
+    @staticmethod
+    def _segment_boxes(toolpath):
+        """
+        (min_x, min_y, max_x, max_y) per segment, NaN for empty segments.
+        """
+        boxes = np.full((len(toolpath), 4), np.nan)
+        lengths = np.diff(toolpath.offsets)
+        nonempty = lengths > 0
+        if not nonempty.any():
+            return boxes
+        coords = toolpath.coords[toolpath.offsets[0]:toolpath.offsets[-1]]
+        starts = (toolpath.offsets[:-1] - toolpath.offsets[0])[nonempty]
+        boxes[nonempty, :2] = np.minimum.reduceat(coords, starts, axis=0)
+        boxes[nonempty, 2:] = np.maximum.reduceat(coords, starts, axis=0)
+        return boxes
+
+    def level_for(self, pixel_size):
+        """
+        Coarsest level whose simplification error stays below half a pixel.
+        """
+        level = 0
+        for i, tolerance in enumerate(self.tolerances):
+            if tolerance <= pixel_size/2:
+                level = i
+        return level
+
+    def visible(self, pixel_size, view=None):
+        """
+        Toolpath at the level for `pixel_size`, restricted to segments whose
+        bounding box intersects view = (min_x, min_y, max_x, max_y).
+
+        Returns:
+            tuple: (level index, list of segment arrays, tool_on array)
+        """
+        level = self.level_for(pixel_size)
+        toolpath = self.level(level)
+        if level not in self._boxes:
+            self._boxes[level] = self._segment_boxes(toolpath)
+        boxes = self._boxes[level]
+        if view is None:
+            mask = ~np.isnan(boxes[:, 0])
+        else:
+            mask = ((boxes[:, 0] <= view[2]) & (boxes[:, 2] >= view[0]) &
+                    (boxes[:, 1] <= view[3]) & (boxes[:, 3] >= view[1]))
+        selected = np.flatnonzero(mask)
+        return level, [toolpath[i] for i in selected], toolpath.tool_on[selected]
+
+
+def pixel_size(ax):
+    """
+    Data units per screen pixel of a matplotlib axes.
+    """
+    bbox = ax.get_window_extent()
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    return max(abs(x1 - x0)/max(bbox.width, 1), abs(y1 - y0)/max(bbox.height, 1))
+
+
+def attach_lod(ax, pyramid: LODPyramid, on_color='red', off_color='blue'):
+    """
+    Draws the pyramid into `ax` as two LineCollections and redraws them with
+    the matching level and only the visible segments whenever the view changes.
+    """
+    from matplotlib.collections import LineCollection
+
+    on_lines = LineCollection([], colors=on_color)
+    off_lines = LineCollection([], colors=off_color)
+    ax.add_collection(off_lines)
+    ax.add_collection(on_lines)
+
+    def update(_=None):
+        x0, x1 = sorted(ax.get_xlim())
+        y0, y1 = sorted(ax.get_ylim())
+        _, segments, tool_on = pyramid.visible(pixel_size(ax), (x0, y0, x1, y1))
+        on_lines.set_segments([seg for seg, on in zip(segments, tool_on) if on])
+        off_lines.set_segments([seg for seg, on in zip(segments, tool_on) if not on])
+
+    if pyramid.bounds:
+        min_x, min_y, max_x, max_y = pyramid.bounds
+        ax.set_xlim(min_x, max_x)
+        ax.set_ylim(min_y, max_y)
+    update()
+    ax.callbacks.connect('xlim_changed', update)
+    ax.callbacks.connect('ylim_changed', update)
+    return update
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+
+class RingBuffer():
+    def __init__(self, capacity, fields):
+        """
+        Fixed-size record buffer backed by a numpy structured array. Once full,
+        the oldest records are overwritten.
+
+        Parameters:
+            capacity (int): Number of records kept.
+            fields (list of str): Float64 column names.
+        """
+        self.data = np.zeros(capacity, dtype=[(name, np.float64) for name in fields])
+        self.capacity = capacity
+        self.count = 0
+
+    def append(self, *values):
+        self.data[self.count % self.capacity] = values
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def array(self):
+        """
+        Records in chronological order (a copy).
+        """
+        if self.count <= self.capacity:
+            return self.data[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate([self.data[start:], self.data[:start]])
+
+
+def _stats(values):
+    if not len(values):
+        return {"count": 0}
+    values = np.asarray(values)
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+class AxisMetrics():
+    def __init__(self, radius, capacity=100_000, settle_tolerance=0.02, clock=time.monotonic):
+        """
+        Runtime metrics of one axis, recorded from telemetry into ring buffers.
+
+        samples: time, commanded and measured position (mm), following error (mm)
+        and velocity (rad/s) for every '>9:' angle update.
+        moves: completion latency from a setpoint being sent until the axis is
+        within settle_tolerance (rad) of it.
+        round_trips: time from writing a setpoint to its '>1:' echo.
+        """
+        self.radius = radius
+        self.settle_tolerance = settle_tolerance
+        self.clock = clock
+        self.samples = RingBuffer(capacity, ["time", "commanded_mm", "measured_mm", "following_error_mm", "velocity"])
+        self.moves = RingBuffer(capacity // 10 or 1, ["time", "target_mm", "latency_s"])
+        self.round_trips = RingBuffer(capacity // 10 or 1, ["time", "rtt_s"])
+        self._pending_move = None  # (target rad, time sent)
+        self._pending_echo = None
+
+    def command(self, target):
+        now = self.clock()
+        self._pending_move = (target, now)
+        self._pending_echo = (target, now)
+
+    def target_echo(self, target):
+        if self._pending_echo and abs(self._pending_echo[0] - target) < 0.0015:
+            now = self.clock()
+            self.round_trips.append(now, now - self._pending_echo[1])
+            self._pending_echo = None
+
+    def sample(self, commanded, measured, velocity):
+        """
+        Record one telemetry sample. Angles are in rad, stored as mm.
+        """
+        now = self.clock()
+        error = (commanded - measured)*self.radius
+        self.samples.append(now, commanded*self.radius, measured*self.radius, error, velocity)
+        if self._pending_move and abs(self._pending_move[0] - measured) <= self.settle_tolerance:
+            self.moves.append(now, self._pending_move[0]*self.radius, now - self._pending_move[1])
+            self._pending_move = None
+
+    def summary(self):
+        samples = self.samples.array()
+        return {
+            "samples": int(self.samples.count),
+            "following_error_mm": _stats(np.abs(samples["following_error_mm"])),
+            "velocity": _stats(np.abs(samples["velocity"])),
+            "move_latency_s": _stats(self.moves.array()["latency_s"]),
+            "round_trip_s": _stats(self.round_trips.array()["rtt_s"]),
+        }
+
+    def to_npz(self, filename):
+        np.savez(filename, samples=self.samples.array(), moves=self.moves.array(),
+                 round_trips=self.round_trips.array())
+
+    def to_csv(self, filename):
+        """
+        Writes the telemetry samples to CSV.
+        """
+        samples = self.samples.array()
+        np.savetxt(filename, np.column_stack([samples[name] for name in samples.dtype.names]),
+                   delimiter=",", header=",".join(samples.dtype.names), comments="", fmt="%.6f")
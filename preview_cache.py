@@ -0,0 +1,105 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from toolpath import Toolpath
+
+PREVIEW_CACHE_DIR = "./.preview_cache"
+# 2: load_gcode skips G0 lines and treats M6 as a tool change
+CACHE_VERSION = 2
+# Limits prune_cache enforces whenever a new entry is written
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_MAX_AGE_S = 30 * 24 * 3600
+
+
+def file_hash(filename, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decimate(toolpath: Toolpath):
+    """
+    Drops repeated points inside each segment (zero-length moves), which
+    G-code output has at every contour start, keeping segment boundaries.
+    """
+    coords = toolpath.coords[toolpath.offsets[0]:toolpath.offsets[-1]]
+    offsets = toolpath.offsets - toolpath.offsets[0]
+    if not len(coords):
+        return toolpath
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    keep[offsets[:-1]] = True  # always keep the first point of a segment
+    kept_before = np.concatenate([[0], np.cumsum(keep)])
+    return Toolpath(coords[keep], kept_before[offsets], toolpath.tool_on, toolpath.feed)
+
+
+def prune_cache(cache_dir=PREVIEW_CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age_s=CACHE_MAX_AGE_S, keep=None):
+    """
+    Deletes cache entries not used for max_age_s seconds, then the least
+    recently used ones until the rest fit in max_bytes. The entry at `keep`
+    (the one just written) is never deleted.
+
+    Returns:
+        int: Number of entries deleted.
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".npz") and not entry.name.endswith(".tmp.npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort(reverse=True)  # most recently used first
+    now = time.time()
+    total = 0
+    removed = 0
+    for mtime, size, path in entries:
+        if path != keep and (now - mtime > max_age_s or total + size > max_bytes):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # pruned by another process
+            continue
+        total += size
+    return removed
+
+
+def load_preview(filename, cache_dir=PREVIEW_CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age_s=CACHE_MAX_AGE_S):
+    """
+    Parsed and decimated strokes of a G-code file, cached on disk by content hash.
+
+    The first call parses the file and stores the arrays and bounds in
+    <cache_dir>/<sha256>.npz; later calls for the same content load them
+    directly, however the file was named or touched. Loading an entry
+    marks it as used; writing one prunes the cache to max_bytes and
+    max_age_s (prune_cache).
+
+    Returns:
+        tuple: (Toolpath, bounds as (min_x, min_y, max_x, max_y) or None)
+    """
+    key = file_hash(filename)
+    path = os.path.join(cache_dir, f"{key}.npz")
+    toolpath = None
+    if os.path.exists(path):
+        with np.load(path) as data:
+            if int(data["version"]) == CACHE_VERSION:
+                toolpath = Toolpath(data["coords"], data["offsets"], data["tool_on"], data["feed"])
+                bounds = tuple(data["bounds"].tolist()) if len(data["bounds"]) else None
+        if toolpath is not None:
+            os.utime(path)
+            return toolpath, bounds
+
+    toolpath = decimate(Toolpath.from_gcode(filename))
+    bounds = toolpath.bounds()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, f"{key}.tmp.npz")
+    np.savez(tmp, version=CACHE_VERSION, coords=toolpath.coords, offsets=toolpath.offsets,
+             tool_on=toolpath.tool_on, feed=toolpath.feed, bounds=np.array(bounds if bounds else [], dtype=float))
+    os.replace(tmp, path)
+    prune_cache(cache_dir, max_bytes, max_age_s, keep=path)
+    return toolpath, bounds
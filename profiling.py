@@ -0,0 +1,92 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from contextlib import contextmanager
+
+
+class Profiler():
+    def __init__(self, enabled=False, cprofile=False):
+        """
+        Collects per-stage timings and counters for a conversion run.
+
+        Parameters:
+            enabled (bool): Record spans and counters. When False every call is a no-op.
+            cprofile (bool): Also run cProfile for the whole time the profiler is enabled.
+        """
+        self.enabled = enabled
+        self.spans = {}
+        self.counters = {}
+        self._stack = []
+        self._started = time.perf_counter()
+        self._cprofile = cProfile.Profile() if enabled and cprofile else None
+        if self._cprofile:
+            self._cprofile.enable()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Times the enclosed block. Nested spans are reported as "outer/inner",
+        and repeated spans accumulate their time and call count.
+        """
+        if not self.enabled:
+            yield
+            return
+        self._stack.append(name)
+        key = "/".join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            entry = self.spans.setdefault(key, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += elapsed
+            entry["calls"] += 1
+
+    def count(self, name, n=1):
+        """
+        Adds `n` to the counter `name`.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self, top=25):
+        """
+        Returns the collected timings and counters as a JSON-serialisable dict.
+        """
+        report = {
+            "total_seconds": time.perf_counter() - self._started,
+            "spans": self.spans,
+            "counters": self.counters,
+        }
+        if self._cprofile:
+            self._cprofile.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._cprofile, stream=stream).sort_stats("cumulative").print_stats(top)
+            report["cprofile"] = stream.getvalue()
+        return report
+
+    def dump(self, filename, cprofile_filename=None):
+        """
+        Writes the report to `filename` as JSON and, if cProfile was enabled,
+        the raw profile to `cprofile_filename` for snakeviz/pstats.
+        """
+        report = self.report()
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=2)
+        if self._cprofile and cprofile_filename:
+            self._cprofile.dump_stats(cprofile_filename)
+        return report
+
+
+def polygon_vertex_count(polygons):
+    """
+    Total number of exterior and interior ring vertices of a list of polygons.
+    """
+    import shapely
+
+    if not len(polygons):
+        return 0
+    return int(shapely.get_num_coordinates(list(polygons)).sum())
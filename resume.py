@@ -0,0 +1,127 @@
+import json
+import os
+import time
+
+import numpy as np
+
+
+class GCodeIndex():
+    def __init__(self, offsets, x, y, tool_on, tool, size, mtime):
+        """
+        Per-line index of a G-code file: byte offset of each line and the
+        modal state (position, spray on/off and fitted tool number) in effect
+        before the line runs.
+        """
+        self.offsets = offsets
+        self.x = x
+        self.y = y
+        self.tool_on = tool_on
+        self.tool = tool
+        self.size = size
+        self.mtime = mtime
+
+    @classmethod
+    def build(cls, file_path):
+        """
+        Indexes a G-code file in one pass, interpreting lines the way
+        Gantry.run_gcode does (G1 X<x> Y<y>, M3, M5, M6 T<tool>). A job
+        starts with tool 1 fitted.
+        """
+        offsets, xs, ys, tools, fitted = [], [], [], [], []
+        x = y = None
+        tool_on = False
+        tool = 1
+        offset = 0
+        with open(file_path, 'rb') as file:
+            for raw in file:
+                offsets.append(offset)
+                xs.append(np.nan if x is None else x)
+                ys.append(np.nan if y is None else y)
+                tools.append(tool_on)
+                fitted.append(tool)
+                offset += len(raw)
+                parts = raw.split()
+                if not parts:
+                    continue
+                cmd = parts[0]
+                if cmd == b"G1":
+                    x = float(parts[1].strip(b"X"))
+                    y = float(parts[2].strip(b"Y"))
+                elif cmd == b"M3":
+                    tool_on = True
+                elif cmd == b"M5":
+                    tool_on = False
+                elif cmd == b"M6":
+                    # Gantry.change_tool switches the spray off
+                    tool_on = False
+                    if len(parts) > 1:
+                        tool = int(parts[1].strip(b"T"))
+        stat = os.stat(file_path)
+        return cls(np.array(offsets, dtype=np.int64), np.array(xs), np.array(ys),
+                   np.array(tools, dtype=bool), np.array(fitted, dtype=np.int64), stat.st_size, stat.st_mtime)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def state_before(self, line):
+        """
+        (x, y, tool_on, tool) in effect before `line` (0-based) runs. x and y
+        are None if no move came before it.
+        """
+        x, y = self.x[line], self.y[line]
+        if np.isnan(x):
+            x = y = None
+        else:
+            x, y = float(x), float(y)
+        return x, y, bool(self.tool_on[line]), int(self.tool[line])
+
+
+class Checkpoint():
+    def __init__(self, path, save_interval=0.5):
+        """
+        Persists the last completed G-code line of a job so it can resume.
+
+        Saves are throttled to one every `save_interval` seconds; flush()
+        forces a save, e.g. on Ctrl+C or a serial error.
+        """
+        self.path = path
+        self.save_interval = save_interval
+        self.line = None
+        self._file_info = None
+        self._last_save = 0.0
+
+    def start(self, file_path, index: GCodeIndex):
+        self._file_info = {"file": os.path.abspath(file_path), "size": index.size, "mtime": index.mtime}
+
+    def load(self, file_path, index: GCodeIndex):
+        """
+        Returns the last completed line stored for this exact file, or None
+        if there is no checkpoint or the file changed since it was written.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            data = json.load(f)
+        if (data.get("file") != os.path.abspath(file_path) or data.get("size") != index.size
+                or data.get("mtime") != index.mtime):
+            return None
+        return data.get("line")
+
+    def update(self, line):
+        self.line = line
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.flush()
+
+    def flush(self):
+        if self.line is None or self._file_info is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({**self._file_info, "line": self.line}, f)
+        os.replace(tmp, self.path)  # atomic, a crash never leaves half a checkpoint
+        self._last_save = time.monotonic()
+
+    def clear(self):
+        self.line = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
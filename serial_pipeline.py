@@ -0,0 +1,119 @@
+import time
+from collections import deque
+
+
+class CommandPipeline():
+    def __init__(self, axis, window=1, ack_timeout=0.5, ack_tolerance=0.0015):
+        """
+        Acknowledged command sender for one Axis.
+
+        Commands are queued and written in one buffer per pump. A setpoint
+        counts as acknowledged once the controller's '>1:' target telemetry
+        echoes it; at most `window` setpoints are written but unacknowledged.
+        The firmware keeps only its latest target, so this is not a motion
+        queue: a later setpoint replaces an earlier one the axis has not
+        reached yet, and callers must wait for each point themselves (see
+        Gantry). Setpoints that are never echoed (lost line, telemetry gap)
+        are given up on after `ack_timeout` seconds.
+
+        Parameters:
+            axis (Axis): Axis whose serial link and telemetry are used.
+            window (int): Maximum number of unacknowledged setpoints.
+            ack_timeout (float): Seconds before an unacknowledged setpoint is given up on.
+            ack_tolerance (float): Max difference between sent and echoed target (rad).
+        """
+        self.axis = axis
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.ack_tolerance = ack_tolerance
+        self.queue = deque()      # (command, target or None)
+        self.in_flight = deque()  # (target, time written)
+
+        self.started = time.monotonic()
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.max_queue_depth = 0
+        self.ack_latency_total = 0.0
+
+    def send(self, command: str, target=None):
+        """
+        Queue a command line. Pass the target angle for setpoint (M<target>)
+        commands so they are tracked until acknowledged.
+        """
+        self.queue.append((command, target))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self.pump()
+
+    @property
+    def queue_depth(self):
+        return len(self.queue) + len(self.in_flight)
+
+    def pump(self):
+        """
+        Process telemetry acknowledgments, then write as many queued commands
+        as the window allows in a single buffer.
+        """
+        now = time.monotonic()
+        for target in self.axis.poll_telemetry().get("1", []):
+            self._acknowledge(target, now)
+        while self.in_flight and now - self.in_flight[0][1] > self.ack_timeout:
+            self.in_flight.popleft()
+            self.timeouts += 1
+
+        buffer = []
+        while self.queue:
+            command, target = self.queue[0]
+            if target is not None:
+                if len(self.in_flight) >= self.window:
+                    break
+                self.in_flight.append((target, now))
+                self.sent += 1
+            buffer.append(command)
+            self.queue.popleft()
+        if buffer:
+            data = "".join(buffer)
+            self.axis.send_command(data)
+            self.writes += 1
+            self.bytes_written += len(data)
+
+    def _acknowledge(self, echoed, now):
+        # The controller applies setpoints in order, so an echo of one
+        # acknowledges it and every setpoint written before it.
+        for i, (target, _) in enumerate(self.in_flight):
+            if abs(target - echoed) <= self.ack_tolerance:
+                for _ in range(i + 1):
+                    _, written = self.in_flight.popleft()
+                    self.acked += 1
+                    self.ack_latency_total += now - written
+                return
+
+    def drain(self, timeout=1.0):
+        """
+        Pump until everything queued is written and acknowledged, or timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self.queue_depth and time.monotonic() < deadline:
+            self.pump()
+            time.sleep(0.0005)
+        return self.queue_depth == 0
+
+    def metrics(self):
+        """
+        Queue depth and throughput counters of the pipeline.
+        """
+        elapsed = time.monotonic() - self.started
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": len(self.in_flight),
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "acked": self.acked,
+            "timeouts": self.timeouts,
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+            "setpoints_per_s": self.acked/elapsed if elapsed else 0.0,
+            "mean_ack_latency_s": self.ack_latency_total/self.acked if self.acked else None,
+        }
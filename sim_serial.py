@@ -0,0 +1,199 @@
+import time
+
+
+class SimulatedAxisSerial():
+    """
+    Loopback stand-in for the serial link of an Axis motor controller.
+
+    Understands the commands Axis sends (MLV<limit>, MC<mode>, MAP/MAI/MAD<gain>,
+    M<target>) and streams the same '>9:<angle>', '>17:<velocity>' and
+    '>1:<target>' telemetry lines as the firmware, computed from a first-order
+    motor model. A hard stop at `hard_stop` rad lets find_home complete.
+    """
+    def __init__(self, sn, timeout=0.1, telemetry_period=0.003, time_constant=0.02,
+                 hard_stop=-20.0, buffer_size=4096, clock=time.monotonic):
+        self.port = f"sim://{sn}"
+        self.timeout = timeout
+        self.is_open = True
+        self.clock = clock
+        self.telemetry_period = telemetry_period
+        self.time_constant = time_constant
+        self.hard_stop = hard_stop
+        self.buffer_size = buffer_size
+
+        self.angle = 0.0
+        self.velocity = 0.0
+        self.target = 0.0
+        self.velocity_limit = 20.0
+        self.p_gain = 20.0
+
+        self._rx = bytearray()
+        self._pending = b""
+        self._now = self.clock()
+        self._next_line = self._now
+        self._line_idx = 0
+
+        # Statistics for executor benchmarks
+        self.commands = 0
+        self.bytes_written = 0
+        self.setpoints = []  # (time commanded, target, time reached or None)
+
+    # pyserial interface used by Axis
+    @property
+    def in_waiting(self):
+        self._advance()
+        return len(self._rx)
+
+    def write(self, data: bytes):
+        if not self.is_open:
+            raise OSError(f"{self.port} is closed")
+        self._advance()
+        self.bytes_written += len(data)
+        self._pending += data
+        while b"\n" in self._pending:
+            line, self._pending = self._pending.split(b"\n", 1)
+            self._handle_command(line.decode("utf-8").strip())
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        deadline = self.clock() + (self.timeout or 0)
+        while True:
+            self._advance()
+            if b"\n" in self._rx:
+                idx = self._rx.index(b"\n") + 1
+                line = bytes(self._rx[:idx])
+                del self._rx[:idx]
+                return line
+            if self.clock() >= deadline:
+                line = bytes(self._rx)
+                self._rx.clear()
+                return line
+            time.sleep(min(self.telemetry_period, 0.001))
+
+    def reset_input_buffer(self):
+        self._advance()
+        self._rx.clear()
+
+    def reset_output_buffer(self):
+        self._pending = b""
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    # Simulation
+    def _handle_command(self, command):
+        self.commands += 1
+        try:
+            if command.startswith("MLV"):
+                self.velocity_limit = float(command[3:])
+            elif command.startswith("MAP"):
+                self.p_gain = float(command[3:])
+            elif command.startswith(("MC", "MAI", "MAD")):
+                pass
+            elif command.startswith("M"):
+                self.target = float(command[1:])
+                self.setpoints.append([self.clock(), self.target, None])
+                self._mark_reached()
+        except ValueError:
+            pass
+
+    def _step(self, dt):
+        v_cmd = max(-self.velocity_limit, min(self.velocity_limit, self.p_gain*(self.target - self.angle)))
+        self.velocity += (v_cmd - self.velocity)*min(1.0, dt/self.time_constant)
+        self.angle += self.velocity*dt
+        if self.angle < self.hard_stop:
+            self.angle = self.hard_stop
+            self.velocity = 0.0
+
+    def _advance(self):
+        now = self.clock()
+        while self._next_line <= now:
+            self._step(self._next_line - self._now)
+            self._now = self._next_line
+            self._mark_reached()
+            self._emit_line()
+            self._next_line += self.telemetry_period/3
+        self._step(now - self._now)
+        self._now = now
+
+    def _mark_reached(self, tolerance=0.01):
+        if self.setpoints and self.setpoints[-1][2] is None and abs(self.angle - self.setpoints[-1][1]) < tolerance:
+            self.setpoints[-1][2] = self._now
+
+    def _emit_line(self):
+        var, value = [("9", self.angle), ("17", self.velocity), ("1", self.target)][self._line_idx]
+        self._line_idx = (self._line_idx + 1) % 3
+        self._rx += f">{var}:{value:.3f}\n".encode("utf-8")
+        if len(self._rx) > self.buffer_size:
+            # Like a full OS buffer, the oldest bytes are lost
+            del self._rx[:len(self._rx) - self.buffer_size]
+
+    def stats(self):
+        """
+        Returns command counts and setpoint latencies (time from command to
+        the motor settling within tolerance of the target).
+        """
+        latencies = [reached - sent for sent, _, reached in self.setpoints if reached is not None]
+        return {
+            "commands": self.commands,
+            "bytes_written": self.bytes_written,
+            "setpoints": len(self.setpoints),
+            "setpoints_reached": len(latencies),
+            "mean_latency_s": sum(latencies)/len(latencies) if latencies else None,
+            "max_latency_s": max(latencies) if latencies else None,
+        }
+
+
+class SimulatedToolSerial():
+    """
+    Loopback stand-in for the tool relay Arduino. Echoes commands and replies
+    'TOOL ON'/'TOOL OFF' like ArduinoControl/src/main.cpp, recording switch times.
+    """
+    def __init__(self, sn, timeout=1, clock=time.monotonic):
+        self.port = f"sim://{sn}"
+        self.timeout = timeout
+        self.is_open = True
+        self.clock = clock
+        self.tool_on = False
+        self.switches = []  # (time, on)
+        self._rx = bytearray()
+        self._pending = b""
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def write(self, data: bytes):
+        self._pending += data
+        while b"\n" in self._pending:
+            line, self._pending = self._pending.split(b"\n", 1)
+            command = line.decode("utf-8").strip()
+            self._rx += f"{command}\r\n".encode("utf-8")
+            if command in ("ON", "OFF"):
+                self.tool_on = command == "ON"
+                self.switches.append((self.clock(), self.tool_on))
+                self._rx += f"TOOL {command}\r\n".encode("utf-8")
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        if b"\n" not in self._rx:
+            return b""
+        idx = self._rx.index(b"\n") + 1
+        line = bytes(self._rx[:idx])
+        del self._rx[:idx]
+        return line
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
@@ -3,16 +3,27 @@ import serial.tools.list_ports
 import time
 import numpy as np
 import logging
+from collections import deque
+from sim_serial import SimulatedAxisSerial, SimulatedToolSerial
+from serial_pipeline import CommandPipeline
+from resume import Checkpoint, GCodeIndex
+from metrics import AxisMetrics
+from calibration import AxisCalibration, CALIBRATION_DIR
+from validate import check_gcode
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 class Tool():
-    def __init__(self, sn):
+    def __init__(self, sn, simulated=False):
         self.sn = sn
+        self.simulated = simulated
         self.ser = self._initialize_serial_connection(self.sn)
-        time.sleep(2) # Initialize arduino after serial connection made
+        if not simulated:
+            time.sleep(2) # Initialize arduino after serial connection made
 
     def _initialize_serial_connection(self, sn, baudrate=9600, timeout=1)->serial.Serial:
+        if self.simulated:
+            return SimulatedToolSerial(sn, timeout=timeout)
         ports = serial.tools.list_ports.comports()
         for port, desc, hwid in ports:
             print(f"{port}: {desc} [{hwid}]")
@@ -36,7 +47,7 @@ class Tool():
     def send_command(self, command: str):
         """Send a command to the serial device and read the response."""
         if self.ser and self.ser.is_open:
-            print("SEND TOOL CMD")
+            logger.debug("SEND TOOL CMD %s", command.strip())
             self.ser.write(command.encode('utf-8'))
             self.ser.flush()
         else:
@@ -45,20 +56,36 @@ class Tool():
         
 
 class Axis():
-    def __init__(self, sn: str):
+    target_decimals = 4  # 1e-4 rad, ~0.6 um at the pulley
+
+    def __init__(self, sn: str, simulated=False, calibration_dir=CALIBRATION_DIR):
+        '''
+        Set simulated=True to drive a SimulatedAxisSerial motor model instead of
+        the USB device with serial number `sn`. The calibration profile stored
+        for `sn` in calibration_dir, if any, is applied in set_target_pos_mm.
+        '''
         self.sn = sn
+        self.calibration = AxisCalibration.load(sn, calibration_dir)
+        self._last_target_mm = None
+        self._direction = 1
+        self.simulated = simulated
         self.origin = 0
         self.position = 0
         self.angle = 0
         self.radius = 6.4
+        self.metrics = AxisMetrics(self.radius)
         self.velocity = 0
         self.angle_target = 0
+        self.commanded_angle = 0
+        self.pipeline = None
         self.ser = self._initialize_serial_connection(sn)
         self._listen_for_message(">")
         self.init_motion()
         self.velocity_limit = 20
     
     def _initialize_serial_connection(self, sn, baudrate=115200, timeout=0.1)->serial.Serial:
+        if self.simulated:
+            return SimulatedAxisSerial(sn, timeout=timeout)
         ports = serial.tools.list_ports.comports()
         for port, desc, hwid in ports:
             print(f"{port}: {desc} [{hwid}]")
@@ -120,30 +147,71 @@ class Axis():
                     line = self.ser.readline().decode('utf-8').strip()
                     if not line.startswith('>'):
                         return
-                    try:
-                        content = line[1:].strip()
-                        var_name, value_str = content.split(':', 1)
-                        value = round(float(value_str),3)
-                        if var_name == "9":
-                            self.angle = value
-                            self.position = round(self.angle*self.radius,3)
-                            up = True
-                            # logging.debug(f"angle: {self.angle}")
-                        elif var_name == "17":
-                            self.velocity = value
-                            uv = True
-                            logging.debug(f"velocity: {self.velocity}")
-                        elif var_name == "1":
-                            self.angle_target = value
-                            ut = True
-                            # logging.debug(f"angle_target: {self.angle_target}")
-
-                    except ValueError:
+                    parsed = self._parse_telemetry(line)
+                    if parsed is None:
                         continue
+                    var_name = parsed[0]
+                    if var_name == "9":
+                        up = True
+                        # logging.debug(f"angle: {self.angle}")
+                    elif var_name == "17":
+                        uv = True
+                    elif var_name == "1":
+                        ut = True
+                        # logging.debug(f"angle_target: {self.angle_target}")
                     # print(f"Received from {self.ser.port}: {line}")
         except:
             self._reconnect_serial()
 
+    def _parse_telemetry(self, line):
+        """
+        Apply one '>var:value' telemetry line, returning (var, value) or None.
+        """
+        if not line.startswith('>'):
+            return None
+        try:
+            var_name, value_str = line[1:].strip().split(':', 1)
+            value = round(float(value_str),3)
+        except ValueError:
+            return None
+        if var_name == "9":
+            self.angle = value
+            self.position = round(self.angle*self.radius,3)
+            self.metrics.sample(self.angle_target, value, self.velocity)
+        elif var_name == "17":
+            self.velocity = value
+        elif var_name == "1":
+            self.angle_target = value
+            self.metrics.target_echo(value)
+        return var_name, value
+
+    def poll_telemetry(self):
+        """
+        Non-blocking read of every complete telemetry line already received.
+
+        Returns:
+            dict: telemetry variable -> list of values, in arrival order.
+        """
+        values = {}
+        try:
+            while self.ser.in_waiting > 0:
+                raw = self.ser.readline()
+                if not raw.endswith(b"\n"):
+                    break
+                parsed = self._parse_telemetry(raw.decode('utf-8').strip())
+                if parsed:
+                    values.setdefault(parsed[0], []).append(parsed[1])
+        except Exception:
+            self._reconnect_serial()
+        return values
+
+    def enable_pipeline(self, window=1, **kwargs):
+        """
+        Route setpoints through a CommandPipeline with at most `window` setpoints unacknowledged.
+        """
+        self.pipeline = CommandPipeline(self, window=window, **kwargs)
+        return self.pipeline
+
     def _reconnect_serial(self):
         print("RESET SERIAL")
         self.ser.close()
@@ -151,13 +219,20 @@ class Axis():
 
 
     def set_target_angle_rad(self, target_angle_rad):
-        target = round(self.origin+target_angle_rad,2)
-        # logging.debug(f"set target M{target}\n")
-        self.send_command(f"M{target}\n")
+        target = round(self.origin+target_angle_rad,self.target_decimals)
+        self.commanded_angle = target
+        self.metrics.command(target)
+        if self.pipeline:
+            self.pipeline.send(f"M{target}\n", target=target)
+        else:
+            self.send_command(f"M{target}\n")
 
     def set_target_pos_mm(self, target_pos_mm):
-        target_angle_rad = round(target_pos_mm/self.radius,2)
-        self.set_target_angle_rad(target_angle_rad=target_angle_rad)
+        if self._last_target_mm is not None and target_pos_mm != self._last_target_mm:
+            self._direction = 1 if target_pos_mm > self._last_target_mm else -1
+        self._last_target_mm = target_pos_mm
+        commanded_mm = self.calibration.command_mm(target_pos_mm, self._direction)
+        self.set_target_angle_rad(target_angle_rad=commanded_mm/self.radius)
 
     def set_velocity_limit(self, limit):
         self.velocity_limit = limit
@@ -176,7 +251,7 @@ class Axis():
             if abs(self.velocity)<0.02:
                 self.origin = self.angle
                 self.set_target_angle_rad(0.5)
-                logging.debug(f"origin set to {self.origin}")
+                logger.info(f"origin set to {self.origin}")
                 time.sleep(1)
 
     def mm2rad(self, mm):
@@ -189,67 +264,278 @@ class Axis():
             print(f"Closed connection to {self.sn}.")
 
 class Gantry():
-    def __init__(self, x_axis: Axis, y_axis: Axis, tool = Tool):
+    def __init__(self, x_axis: Axis, y_axis: Axis, tool = Tool, pipelined=False, lookahead=8, tolerance_mm=0.2,
+                 collinear_mm=0.02):
+        '''
+        pipelined=True is an accuracy mode, not a faster one. The default mode
+        sleeps an estimated move time and does not check the axes got there;
+        the pipelined mode waits on telemetry until both axes are within
+        tolerance_mm of a point before the next one is sent. The controller
+        follows only its latest setpoint, so points cannot be streamed ahead.
+
+        set_xy queues up to `lookahead` points. Points that lie on the
+        straight line from the last reached point to a later one (within
+        collinear_mm, in order along it) are traced by moving to that later
+        point directly, so runs of collinear points cost one move instead of
+        a stop at each. settle() waits for the queue to drain; it runs before
+        tool switches and at the end of a job.
+        '''
         self.x_axis = x_axis
         self.y_axis = y_axis
         self.tool = tool
         self.x = None
         self.y = None
+        self.pipelined = pipelined
+        self.lookahead = lookahead
+        self.tolerance_mm = tolerance_mm
+        self.collinear_mm = collinear_mm
+        self._lookahead = deque()  # (x, y, line) not yet sent to the axes
+        self._released = None      # last (x, y) sent to the axes
+        self._reached = True       # whether the axes have reached it
+        self._unreached = []       # G-code lines moved along to reach it, until it is reached
+        if pipelined:
+            for axis in (x_axis, y_axis):
+                axis.enable_pipeline(window=1)
+
+    def _near(self, tolerance_mm):
+        return all(abs(axis.angle - axis.commanded_angle)*axis.radius <= tolerance_mm
+                   for axis in (self.x_axis, self.y_axis))
+
+    def _release_count(self):
+        '''
+        Number of queued points covered by the next move: the head and every
+        following point such that the points before it lie on the segment
+        from the last released point to it, within collinear_mm and in order.
+        '''
+        if self._released is None:
+            return 1
+        points = np.array([(x, y) for x, y, _ in self._lookahead])
+        start = np.asarray(self._released)
+        count = 1
+        for end in range(1, len(points)):
+            chord = points[end] - start
+            length = np.hypot(*chord)
+            if length == 0:
+                break
+            between = points[:end + 1] - start
+            deviation = np.abs(between[:, 0]*chord[1] - between[:, 1]*chord[0])/length
+            along = (between @ chord)/length
+            if (deviation.max() > self.collinear_mm or along[0] < -self.collinear_mm or
+                    np.any(np.diff(along) < -self.collinear_mm)):
+                break
+            count = end + 1
+        return count
+
+    def _service(self):
+        '''
+        Pump the axis pipelines and, once the axes have reached the last
+        released point, send the next move.
+        '''
+        for axis in (self.x_axis, self.y_axis):
+            axis.pipeline.pump()
+        # Reached means the controller echoed the setpoint and telemetry
+        # since shows both axes within tolerance_mm of it
+        if not self._reached:
+            if (not self._near(self.tolerance_mm) or
+                    any(axis.pipeline.queue_depth for axis in (self.x_axis, self.y_axis))):
+                return
+            self._reached = True
+            self._unreached = []
+        if not self._lookahead:
+            return
+        for _ in range(self._release_count()):
+            x, y, line = self._lookahead.popleft()
+            if line is not None:
+                self._unreached.append(line)
+        self.x_axis.set_target_pos_mm(x)
+        self.y_axis.set_target_pos_mm(y)
+        self._released = (x, y)
+        self._reached = False
+
+    def _completed_line(self, line_no):
+        '''
+        Last G-code line that is done on the machine: the line before the
+        first one whose point the axes have not reached yet, whether it is
+        queued or already sent.
+        '''
+        pending = self._unreached + [line for _, _, line in self._lookahead if line is not None]
+        return min(pending) - 1 if pending else line_no
+
+    def settle(self, timeout=10):
+        '''
+        Trace every queued point and wait until the axes have reached the last one.
+        '''
+        if not self.pipelined:
+            return True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self._service()
+            if not self._lookahead and self._reached:
+                return True
+            time.sleep(0.0005)
+        return False
 
-    def set_xy(self, x_pos_mm, y_pos_mm):
+    def set_xy(self, x_pos_mm, y_pos_mm, line=None):
         '''
-        Set x and y position, give the motor enough time to get there based on telemetry update
+        Set x and y position, give the motor enough time to get there based on telemetry update.
+        When pipelined, queue it instead; `line` is the G-code line it came from.
         '''
         delay = 1
         fudge = 1
-        if self.x and self.y:
+        if self.x is not None and self.y is not None:
             radians_to_go = self.x_axis.mm2rad(x_pos_mm - self.x)
             est_time_1 = fudge*radians_to_go/(self.x_axis.velocity_limit-10)
-            print(f"x-distance: {x_pos_mm - self.x}")
-            print(f"x-rads: {self.x_axis.mm2rad(x_pos_mm - self.x)}")
-            print(f"x-est: {est_time_1}")
             radians_to_go = self.y_axis.mm2rad(y_pos_mm - self.y)
             est_time_2 = fudge*radians_to_go/(self.y_axis.velocity_limit-10)
-            print(f"y-distance: {y_pos_mm - self.y}")
-            print(f"y-rads: {self.y_axis.mm2rad(y_pos_mm - self.y)}")
-            print(f"y-est: {est_time_2}")
             delay = max(abs(est_time_1),abs(est_time_2))
-            print(f"DELAY{delay}")
+            logger.debug("x-distance %s x-est %s y-distance %s y-est %s delay %s",
+                         x_pos_mm - self.x, est_time_1, y_pos_mm - self.y, est_time_2, delay)
 
         self.x = x_pos_mm
         self.y = y_pos_mm
+        if self.pipelined:
+            self._lookahead.append((x_pos_mm, y_pos_mm, line))
+            deadline = time.monotonic() + 2*abs(delay) + 1
+            self._service()
+            while len(self._lookahead) >= self.lookahead and time.monotonic() < deadline:
+                time.sleep(0.0005)
+                self._service()
+            return
         self.x_axis.set_target_pos_mm(x_pos_mm)
         self.y_axis.set_target_pos_mm(y_pos_mm)
-        time.sleep(delay)
+        self._sleep_polling(delay)
         # time.sleep(0.005)
         # time.sleep(max(abs(est_time_1),abs(est_time_2)))
 
+    def _sleep_polling(self, delay):
+        '''
+        Wait `delay` seconds while reading telemetry, so metrics keep sampling
+        and the serial input buffers do not fill up during long moves.
+        '''
+        deadline = time.monotonic() + delay
+        while True:
+            self.x_axis.poll_telemetry()
+            self.y_axis.poll_telemetry()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.002))
+
+    def metrics_summary(self):
+        return {"x": self.x_axis.metrics.summary(), "y": self.y_axis.metrics.summary()}
+
+    def export_metrics(self, prefix, fmt="npz"):
+        '''
+        Write each axis' metrics to <prefix>_x.<fmt> and <prefix>_y.<fmt> (npz or csv).
+        '''
+        for name, axis in (("x", self.x_axis), ("y", self.y_axis)):
+            if fmt == "csv":
+                axis.metrics.to_csv(f"{prefix}_{name}.csv")
+            else:
+                axis.metrics.to_npz(f"{prefix}_{name}.npz")
+
     def purge(self,time_s = 1):
         self.set_xy(0,500)
-        self.tool.tool_on()
+        self.switch_tool(True)
         time.sleep(time_s)
         self.tool.tool_off()
 
-    def run_gcode(self, file_path):
+    def switch_tool(self, on):
+        '''
+        Switch the tool once the queued moves are done, so the spray starts and
+        stops exactly at the contour ends.
+        '''
+        self.settle()
+        if on:
+            self.tool.tool_on()
+        else:
+            self.tool.tool_off()
+
+    def change_tool(self, tool):
+        '''
+        Stop spraying and wait for the operator to fit tool `tool` (M6 T#),
+        then purge the new nozzle.
+        '''
+        self.switch_tool(False)
+        input(f"Fit tool {tool} and press enter")
+        self.purge(2)
+
+    def run_gcode(self, file_path, start_line=0, checkpoint_path=None, resume=False, validate=True):
+        '''
+        Run a G-code file. The file is validated first and nothing moves if
+        it has errors (GCodeValidationError); warnings are logged.
+
+        Parameters:
+            file_path (str): G-code file to run.
+            start_line (int): 0-based line to start from. The gantry first moves
+                there with the tool off and restores the tool state in effect;
+                the operator is asked to fit the tool of the last M6 unless it is tool 1.
+            checkpoint_path (str): File recording the last completed line.
+            resume (bool): Continue after the line stored in checkpoint_path.
+            validate (bool): Check the file with validate.check_gcode first.
+        '''
+        if validate:
+            for problem in check_gcode(file_path):
+                logger.warning(f"{file_path}: {problem}")
+        index = GCodeIndex.build(file_path)
+        checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        if checkpoint:
+            checkpoint.start(file_path, index)
+            if resume:
+                last = checkpoint.load(file_path, index)
+                if last is not None:
+                    start_line = last + 1
+                    print(f"Resuming {file_path} at line {start_line + 1}")
+        if start_line >= len(index):
+            print(f"Nothing left to run in {file_path}")
+            return
+
+        x, y, tool_on, tool = index.state_before(start_line) if start_line else (None, None, False, 1)
+        if tool != 1:
+            # The job stopped after an M6: the operator has to fit that tool again
+            input(f"Resuming with tool T{tool}: fit it and press enter")
         self.purge(2)
-        with open(file_path, 'r') as file:
-            for line in file:
-                parts = line.split()
-                if len(parts) == 0: continue
-                cmd = parts[0]
-                if cmd == "G1":
-                    x = float(parts[1].strip("X"))
-                    y = float(parts[2].strip("Y"))
-                    # print(f"{x}-{y}")
-                    self.set_xy(x,y)
-                elif cmd == "M3":
-                    self.tool.tool_on()
-                elif cmd == "M5":
-                    self.tool.tool_off()
+        if x is not None:
+            self.set_xy(x,y)
+        if tool_on:
+            self.switch_tool(True)
+
+        line_no = start_line
+        try:
+            with open(file_path, 'rb') as file:
+                file.seek(index.offsets[start_line])
+                for line_no, line in enumerate(file, start=start_line):
+                    parts = line.decode('utf-8').split()
+                    if len(parts) == 0: continue
+                    cmd = parts[0]
+                    if cmd == "G1":
+                        x = float(parts[1].strip("X"))
+                        y = float(parts[2].strip("Y"))
+                        # print(f"{x}-{y}")
+                        self.set_xy(x,y,line=line_no)
+                    elif cmd == "M3":
+                        self.switch_tool(True)
+                    elif cmd == "M5":
+                        self.switch_tool(False)
+                    elif cmd == "M6":
+                        self.change_tool(parts[1] if len(parts) > 1 else "")
+                    if checkpoint:
+                        checkpoint.update(self._completed_line(line_no))
+                self.settle()
+        except BaseException:
+            if checkpoint:
+                checkpoint.flush()
+                print(f"Stopped at line {line_no + 1}, checkpoint saved to {checkpoint.path}")
+            raise
+        if checkpoint:
+            checkpoint.clear()
+        for name, summary in self.metrics_summary().items():
+            logger.info(f"{name}-axis metrics: {summary}")
 
 
 
 def main():
+    logging.basicConfig(level=logging.INFO)
     # Replace 'COM1' and 'COM2' with your actual port names
     global tool_head
     tool_head = Tool(sn="3423931353535120B1E0")
@@ -273,10 +559,12 @@ def main():
     #######################################
     try:
         while 1:
-            if input('spray?').lower() == "y":
+            answer = input('spray? (y/n/r to resume)').lower()
+            if answer in ("y", "r"):
                 # gantry.run_gcode("./output.gcode")
                 # gantry.run_gcode("./circle.gcode")
-                gantry.run_gcode("./infill.gcode")
+                gantry.run_gcode("./infill.gcode", checkpoint_path="./infill.gcode.checkpoint", resume=answer == "r")
+                gantry.export_metrics("./infill_metrics")
             if input('again?').lower() == "n":
                 kill(gantry)
     except KeyboardInterrupt:
@@ -0,0 +1,117 @@
+import math
+
+import numpy as np
+import shapely
+from shapely.geometry import box
+
+from helpers import repair_polygons
+
+
+def make_tiles(bounds, tile_size):
+    """
+    Partitions a bounding box into square tiles.
+
+    Tiles are returned in serpentine order (left to right, then right to left
+    on the next row) so consecutive tiles are neighbours and travel between
+    them stays short.
+
+    Parameters:
+        bounds (tuple): (min_x, min_y, max_x, max_y) in mm.
+        tile_size (float): Tile edge length in mm.
+
+    Returns:
+        list of shapely.geometry.Polygon: Tile boxes.
+    """
+    min_x, min_y, max_x, max_y = (float(b) for b in bounds)
+    cols = max(1, math.ceil((max_x - min_x) / tile_size))
+    rows = max(1, math.ceil((max_y - min_y) / tile_size))
+    tiles = []
+    for row in range(rows):
+        col_order = range(cols) if row % 2 == 0 else reversed(range(cols))
+        for col in col_order:
+            x0 = min_x + col * tile_size
+            y0 = min_y + row * tile_size
+            tiles.append(box(x0, y0, x0 + tile_size, y0 + tile_size))
+    return tiles
+
+
+def region_coordinates(region):
+    """
+    Start point of every line in a Region2 command, as used for its polygon.
+    """
+    return [(float(cmd.start_point.x.value), float(cmd.start_point.y.value)) for cmd in region.command_buffer]
+
+
+class RegionIndex():
+    def __init__(self, regions):
+        """
+        Spatial index of Region2 commands by their bounding boxes.
+
+        Only an (N, 4) bounds array and the STRtree are kept; polygons are
+        built on demand for the regions a tile needs.
+        """
+        self.regions = regions
+        bounds = np.empty((len(regions), 4))
+        for i, region in enumerate(regions):
+            coords = np.asarray(region_coordinates(region))
+            bounds[i, :2] = coords.min(axis=0)
+            bounds[i, 2:] = coords.max(axis=0)
+        self.bounds = bounds
+        self.tree = shapely.STRtree(shapely.box(*bounds.T))
+
+    def query(self, tile):
+        """
+        Indices of the regions whose bounding box touches `tile`, in input order.
+        """
+        return np.sort(self.tree.query(tile))
+
+    def polygons(self, indices):
+        """
+        Polygons of the regions at `indices`, built in one shapely call and
+        repaired like gerber2gcode.regions_to_polygons does.
+        """
+        coords = [region_coordinates(self.regions[i]) for i in indices]
+        if not coords:
+            return np.empty(0, dtype=object)
+        ring_index = np.repeat(np.arange(len(coords)), [len(c) for c in coords])
+        return repair_polygons(shapely.polygons(shapely.linearrings(np.concatenate(coords), indices=ring_index)))
+
+    def owners(self, tiles):
+        """
+        Index into `tiles` of the tile that owns each region: the first tile
+        containing the region's min corner or, failing that, the first tile
+        its bounding box touches. -1 for regions outside every tile.
+        """
+        tree = shapely.STRtree(tiles)
+        owner = np.full(len(self.regions), len(tiles))
+        regions, tile_index = tree.query(shapely.box(*self.bounds.T), predicate="intersects")
+        np.minimum.at(owner, regions, tile_index)
+        corner_owner = np.full(len(self.regions), len(tiles))
+        corners, tile_index = tree.query(shapely.points(self.bounds[:, :2]), predicate="intersects")
+        np.minimum.at(corner_owner, corners, tile_index)
+        owner = np.where(corner_owner < len(tiles), corner_owner, owner)
+        owner[owner == len(tiles)] = -1
+        return owner
+
+
+def iter_tile_polygons(index, tiles, shrink):
+    """
+    Yields (tile, polygons) with the shrunk region polygons each tile pockets.
+
+    Every feature is pocketed whole by exactly one tile, the one owning its
+    min corner (RegionIndex.owners), even where it reaches into neighbouring
+    tiles. Clipping features at the seams would pocket every piece on its own
+    and spray the seams twice; a feature larger than a tile has to be
+    pocketed whole to be clipped without that anyway.
+
+    Parameters:
+        index (RegionIndex): Spatial index of the regions.
+        tiles (list): Tile boxes from make_tiles.
+        shrink (float): Inward buffer distance applied to each whole feature.
+    """
+    owner = index.owners(tiles)
+    for i, tile in enumerate(tiles):
+        candidates = index.query(tile)
+        shrunk = shapely.buffer(index.polygons(candidates[owner[candidates] == i]), -shrink,
+                                quad_segs=16, join_style="round")
+        yield tile, shrunk[~shapely.is_empty(shrunk)].tolist()
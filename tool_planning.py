@@ -0,0 +1,58 @@
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+def _opening(geometries, distance, quad_segs):
+    """
+    Erode then dilate by `distance`: removes parts narrower than 2*distance.
+    """
+    return shapely.buffer(shapely.buffer(geometries, -distance, quad_segs=quad_segs, join_style="round"),
+                          distance, quad_segs=quad_segs, join_style="round")
+
+
+def _parts(geometries):
+    parts = shapely.get_parts(geometries)
+    return list(parts[~shapely.is_empty(parts)])
+
+
+def plan_tools(polygons, tools, tolerance=0.01, resolution=16):
+    """
+    Splits the polygons into per-tool pocketing passes.
+
+    Tools are tried from the widest down. A polygon goes to the widest tool
+    that fits in it (its buffer(-tool/2) is not empty); that tool sprays
+    everything it can reach, and the rest - corners and necks the wider
+    tools could not get into - is handed to the next smaller tool, whose
+    pass covers every centre inside the polygon that reaches into the rest.
+    Consecutive passes therefore overlap instead of leaving seams.
+    All steps run as shapely array operations over every polygon at once.
+
+    Parameters:
+        polygons (list of shapely.geometry.Polygon): Areas to spray.
+        tools (list of float): Available spray widths in mm.
+        tolerance (float): Rest regions thinner than twice this (mm) are
+            treated as covered, which drops buffering noise along edges.
+        resolution (int): Segments per quarter circle for the buffers.
+
+    Returns:
+        tuple: (list of (tool width, list of Polygon) from the widest tool to
+        the smallest, each polygon already shrunk by half the tool width and
+        ready for pocketing; array with the area left uncovered per polygon)
+    """
+    targets = np.array(polygons, dtype=object)
+    covered = np.array([Polygon()]*len(targets), dtype=object)
+    passes = []
+    for tool in sorted(set(tools), reverse=True):
+        rest = _opening(shapely.difference(targets, covered), tolerance, resolution)
+        # Tool centres that stay inside the polygon and reach into the rest
+        inside = shapely.buffer(targets, -tool/2, quad_segs=resolution, join_style="round")
+        centre = shapely.intersection(inside, shapely.buffer(rest, tool/2, quad_segs=resolution, join_style="round"))
+        reached = ~shapely.is_empty(centre) & ~shapely.is_empty(rest)
+        if not reached.any():
+            continue
+        sprayed = shapely.buffer(centre[reached], tool/2, quad_segs=resolution, join_style="round")
+        covered[reached] = shapely.union(covered[reached], sprayed)
+        passes.append((tool, _parts(centre[reached])))
+    uncovered = shapely.area(shapely.difference(targets, covered))
+    return passes, uncovered
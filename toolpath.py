@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class Toolpath():
+    """
+    Array-backed toolpath: one contiguous (N, 2) coordinate buffer split into
+    segments by an offsets array, with a tool state and feed per segment.
+
+    Segment i is coords[offsets[i]:offsets[i + 1]]. Indexing a segment or
+    slicing a range of segments returns views into the same buffer.
+    """
+    __slots__ = ("coords", "offsets", "tool_on", "feed")
+
+    def __init__(self, coords, offsets, tool_on=None, feed=None):
+        self.coords = np.ascontiguousarray(coords).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        n = len(self.offsets) - 1
+        self.tool_on = np.ones(n, dtype=bool) if tool_on is None else np.asarray(tool_on, dtype=bool)
+        self.feed = np.full(n, 800.0) if feed is None else np.asarray(feed, dtype=float)
+
+    @classmethod
+    def empty(cls, dtype=np.float64):
+        return cls(np.zeros((0, 2), dtype=dtype), [0])
+
+    @classmethod
+    def from_arrays(cls, arrays, tool_on=True, feed=800, dtype=np.float64):
+        """
+        Builds a toolpath from a list of (n, 2) point arrays, such as the
+        output of pocketing.contour.contour_parallel.
+        """
+        arrays = [np.asarray(a, dtype=dtype)[:, :2] for a in arrays if len(a)]
+        if not arrays:
+            return cls.empty(dtype)
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        return cls(np.concatenate(arrays), offsets,
+                   np.full(len(arrays), tool_on, dtype=bool), np.full(len(arrays), feed, dtype=float))
+
+    @classmethod
+    def concatenate(cls, toolpaths):
+        toolpaths = [tp for tp in toolpaths if len(tp)]
+        if not toolpaths:
+            return cls.empty()
+        offsets = [toolpaths[0].offsets - toolpaths[0].offsets[0]]
+        for tp in toolpaths[1:]:
+            offsets.append(tp.offsets[1:] - tp.offsets[0] + offsets[-1][-1])
+        return cls(np.concatenate([tp.coords[tp.offsets[0]:tp.offsets[-1]] for tp in toolpaths]),
+                   np.concatenate(offsets),
+                   np.concatenate([tp.tool_on for tp in toolpaths]),
+                   np.concatenate([tp.feed for tp in toolpaths]))
+
+    @classmethod
+    def from_gcode(cls, filename):
+        """
+        Loads the moves of a G-code file, splitting segments where the tool
+        switches. Each segment starts at the position the previous one ended.
+        """
+        from gcode_analysis import load_gcode
+
+        data = load_gcode(filename)
+        if not len(data["x"]):
+            return cls.empty()
+        points = np.column_stack([np.concatenate([[0.0], data["x"]]), np.concatenate([[0.0], data["y"]])])
+        state = data["tool_on"]
+        # Move i goes from points[i] to points[i + 1]; split where the state changes
+        starts = np.flatnonzero(np.concatenate([[True], state[1:] != state[:-1]]))
+        ends = np.concatenate([starts[1:], [len(state)]])
+        lengths = ends - starts + 1
+        offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return cls(points[index], offsets, state[starts])
+
+    def with_tool_state(self, tool_on):
+        """
+        Same coordinates and offsets with a new per-segment tool state.
+        """
+        return Toolpath(self.coords, self.offsets, tool_on, self.feed)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("Toolpath slices must be contiguous")
+            stop = max(start, stop)
+            return Toolpath(self.coords, self.offsets[start:stop + 1], self.tool_on[start:stop], self.feed[start:stop])
+        if item < 0:
+            item += len(self)
+        return self.coords[self.offsets[item]:self.offsets[item + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def n_points(self):
+        return int(self.offsets[-1] - self.offsets[0])
+
+    def bounds(self):
+        """
+        (min_x, min_y, max_x, max_y) of all points, or None if empty.
+        """
+        points = self.coords[self.offsets[0]:self.offsets[-1]]
+        if not len(points):
+            return None
+        return (*points.min(axis=0), *points.max(axis=0))
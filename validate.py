@@ -0,0 +1,146 @@
+import argparse
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# Travel of the gantry in mm as (min_x, min_y, max_x, max_y); the purge
+# position (0, 500) of Gantry.purge sits on its edge.
+ENVELOPE_MM = (0.0, 0.0, 500.0, 500.0)
+# Longest move allowed with the tool on, in mm
+MAX_JUMP_MM = 250.0
+
+_NUMBER = r"-?(?:\d+\.?\d*|\.\d+)"
+# Moves in the form Gantry.run_gcode reads them: X then Y as the first words
+_MOVE_RE = re.compile(rf"G1 X({_NUMBER}) Y({_NUMBER})(?: F{_NUMBER})?\r?")
+_OTHER_RE = re.compile(rf"G0(?: [XYZF]{_NUMBER})*|M3(?: S{_NUMBER})?|M5|M6 T\d+|G2[18]|G90|M30|M2")
+
+
+class Problem(namedtuple("Problem", ["line", "severity", "message"])):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"line {self.line}: {self.severity}: {self.message}"
+
+
+class GCodeValidationError(ValueError):
+    def __init__(self, filename, problems):
+        self.problems = problems
+        errors = [p for p in problems if p.severity == "error"]
+        super().__init__(f"{filename}: {len(errors)} error(s), first: {errors[0]}" if errors else filename)
+
+
+def validate_gcode(filename, envelope=ENVELOPE_MM, max_jump_mm=MAX_JUMP_MM):
+    """
+    Checks a G-code file in one pass before it is run on the gantry.
+
+    Reports lines Gantry.run_gcode cannot read, moves outside the machine
+    envelope, sprayed moves longer than max_jump_mm, redundant M3, tool
+    changes with the spray on and a spray left on at the end of the file.
+    Lines are classified in a single loop; the geometric checks run on
+    numpy arrays of all moves afterwards.
+
+    Parameters:
+        filename (str): G-code file to check.
+        envelope (tuple): (min_x, min_y, max_x, max_y) in mm.
+        max_jump_mm (float): Longest sprayed move, None to skip the check.
+
+    Returns:
+        list of Problem: (1-based line, "error" or "warning", message), by line.
+    """
+    problems = []
+    move_lines, xs, ys, move_tool = [], [], [], []
+    tool_on = False
+    last_m3 = None
+    move_match = _MOVE_RE.fullmatch
+    other_match = _OTHER_RE.fullmatch
+    with open(filename, "r", errors="replace") as f:
+        lines = f.read().split("\n")
+    for line_no, line in enumerate(lines, start=1):
+        # Generated moves match as they are; anything else is stripped first
+        m = move_match(line)
+        if not m:
+            if ";" in line:
+                line = line[:line.index(";")]
+            line = line.strip()
+            if not line:
+                continue
+            m = move_match(line)
+        if m:
+            move_lines.append(line_no)
+            xs.append(m.group(1))
+            ys.append(m.group(2))
+            move_tool.append(tool_on)
+            continue
+        if not other_match(line):
+            problems.append(Problem(line_no, "error", f"cannot parse '{line}'"))
+            continue
+        cmd = line.split(None, 1)[0]
+        if cmd == "M3":
+            if tool_on:
+                problems.append(Problem(line_no, "warning", f"redundant M3, tool already on since line {last_m3}"))
+            else:
+                last_m3 = line_no
+            tool_on = True
+        elif cmd == "M5":
+            tool_on = False
+        elif cmd == "M6" and tool_on:
+            problems.append(Problem(line_no, "error", f"tool change with the tool on since line {last_m3}"))
+    if tool_on:
+        problems.append(Problem(last_m3, "error", "tool switched on here is never switched off (missing M5)"))
+
+    if move_lines:
+        move_lines = np.array(move_lines)
+        x = np.array(xs, dtype=float)
+        y = np.array(ys, dtype=float)
+        min_x, min_y, max_x, max_y = envelope
+        outside = (x < min_x) | (x > max_x) | (y < min_y) | (y > max_y)
+        for i in np.flatnonzero(outside):
+            problems.append(Problem(int(move_lines[i]), "error",
+                                    f"X{x[i]:g} Y{y[i]:g} is outside the machine envelope {envelope}"))
+        if max_jump_mm is not None and len(x) > 1:
+            length = np.hypot(np.diff(x), np.diff(y))
+            for i in np.flatnonzero((length > max_jump_mm) & np.array(move_tool[1:], dtype=bool)) + 1:
+                problems.append(Problem(int(move_lines[i]), "error",
+                                        f"sprayed move of {length[i - 1]:.1f} mm exceeds {max_jump_mm:g} mm"))
+    problems.sort(key=lambda p: p.line)
+    return problems
+
+
+def check_gcode(filename, **kwargs):
+    """
+    Runs validate_gcode and raises GCodeValidationError if it found errors.
+
+    Returns:
+        list of Problem: The warnings.
+    """
+    problems = validate_gcode(filename, **kwargs)
+    if any(p.severity == "error" for p in problems):
+        raise GCodeValidationError(filename, problems)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check G-code files before running them on the gantry.")
+    parser.add_argument("files", nargs="+", help="G-code files to check")
+    parser.add_argument("--envelope", type=float, nargs=4, default=ENVELOPE_MM,
+                        metavar=("MIN_X", "MIN_Y", "MAX_X", "MAX_Y"), help="Machine travel in mm")
+    parser.add_argument("--max-jump", type=float, default=MAX_JUMP_MM, help="Longest sprayed move in mm")
+    parser.add_argument("--max-problems", type=int, default=50, help="Problems printed per file")
+    args = parser.parse_args()
+
+    failed = False
+    for filename in args.files:
+        problems = validate_gcode(filename, tuple(args.envelope), args.max_jump)
+        errors = sum(p.severity == "error" for p in problems)
+        failed |= bool(errors)
+        print(f"{filename}: {errors} error(s), {len(problems) - errors} warning(s)")
+        for problem in problems[:args.max_problems]:
+            print(f"  {problem}")
+        if len(problems) > args.max_problems:
+            print(f"  ... {len(problems) - args.max_problems} more")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()